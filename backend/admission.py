@@ -0,0 +1,261 @@
+"""
+Admission control for pipeline runs.
+
+A run is admitted only while the deployment has fewer than
+ADMISSION_MAX_CONCURRENT runs in flight and the caller's tenant (X-Tenant-ID)
+fewer than ADMISSION_TENANT_MAX_CONCURRENT. Otherwise the request waits in a
+bounded per-worker queue for at most ADMISSION_MAX_WAIT_SECONDS; a full queue
+or an expired wait is rejected (429 + Retry-After) instead of piling more work
+onto the DB pool and the LLM.
+
+On Postgres the limits are shared by all workers: each running slot is a row in
+`admission_leases`, taken under a transaction-scoped advisory lock. Leases
+carry an expiry so slots of a crashed worker are reclaimed. The lease
+transactions run in a worker thread, never on the event loop. Off Postgres the
+limits are per process.
+
+Queued requests keep FIFO order, except that a waiter held back only by its own
+tenant's limit does not block other tenants while global slots are free.
+"""
+import asyncio
+import math
+import os
+import socket
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+
+from db import AdmissionLease, get_engine
+from settings import (
+    ADMISSION_LEASE_TTL_SECONDS,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_QUEUE_MAX,
+    ADMISSION_TENANT_MAX_CONCURRENT,
+)
+
+TENANT_HEADER = "X-Tenant-ID"
+DEFAULT_TENANT = "default"
+ADMISSION_LOCK_KEY = 72_610_038
+# how often a queued request re-checks the shared leases (other workers free slots too)
+SHARED_POLL_SECONDS = 0.25
+
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+class Rejected(Exception):
+    """Request not admitted; `retry_after` is a whole number of seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+@dataclass
+class Ticket:
+    tenant: str
+    lease_id: Optional[int]
+    admitted_at: float
+
+
+def _shared() -> bool:
+    return get_engine().dialect.name == "postgresql"
+
+
+def _try_lease(tenant: str, global_max: int, tenant_max: int) -> Tuple[Optional[int], bool]:
+    """(lease id, False) when admitted, else (None, whether the tenant's own limit is what blocked it)."""
+    now = datetime.now(timezone.utc)
+    with get_engine().begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": ADMISSION_LOCK_KEY})
+        conn.execute(delete(AdmissionLease).where(AdmissionLease.expires_at < now))
+        total, mine = conn.execute(
+            select(func.count(), func.count().filter(AdmissionLease.tenant == tenant)).select_from(AdmissionLease)
+        ).one()
+        if mine >= tenant_max:
+            return None, True
+        if total >= global_max:
+            return None, False
+        lease_id = conn.execute(
+            insert(AdmissionLease)
+            .values(tenant=tenant, holder=HOLDER, expires_at=now + timedelta(seconds=ADMISSION_LEASE_TTL_SECONDS))
+            .returning(AdmissionLease.id)
+        ).scalar_one()
+        return lease_id, False
+
+
+def _release_lease(lease_id: int) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(delete(AdmissionLease).where(AdmissionLease.id == lease_id))
+
+
+def _drop_orphan_lease(attempt: "asyncio.Future") -> None:
+    if attempt.cancelled() or attempt.exception() is not None:
+        return
+    lease_id, _ = attempt.result()
+    if lease_id is not None:
+        asyncio.get_running_loop().run_in_executor(None, _release_lease, lease_id)
+
+
+def shared_usage() -> Optional[Dict[str, int]]:
+    """Live (unexpired) leases per tenant across all workers; None off Postgres."""
+    if not _shared():
+        return None
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            select(AdmissionLease.tenant, func.count())
+            .where(AdmissionLease.expires_at >= datetime.now(timezone.utc))
+            .group_by(AdmissionLease.tenant)
+        ).all()
+    return {tenant: n for tenant, n in rows}
+
+
+class Limiter:
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        tenant_max_concurrent: int = ADMISSION_TENANT_MAX_CONCURRENT,
+        queue_max: int = ADMISSION_QUEUE_MAX,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.tenant_max_concurrent = max(1, tenant_max_concurrent)
+        self.queue_max = max(0, queue_max)
+        self.max_wait = max_wait
+        self.active = 0
+        self.active_by_tenant: Counter = Counter()
+        self._waiters: Deque[List[Any]] = deque()  # [tenant, future, blocked only by own tenant limit]
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._waits_ms: Deque[float] = deque(maxlen=1024)
+        self._avg_hold = 1.0  # EWMA of run duration (s), drives Retry-After
+
+    # ---------- admission ----------
+    async def _try_admit(self, tenant: str) -> Tuple[Optional[Ticket], bool]:
+        """(ticket, False) when admitted, else (None, tenant_full)."""
+        if self.active_by_tenant[tenant] >= self.tenant_max_concurrent:
+            return None, True
+        if self.active >= self.max_concurrent:
+            return None, False
+        lease_id = None
+        if _shared():
+            attempt = asyncio.ensure_future(
+                asyncio.to_thread(_try_lease, tenant, self.max_concurrent, self.tenant_max_concurrent)
+            )
+            try:
+                lease_id, tenant_full = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                attempt.add_done_callback(_drop_orphan_lease)  # the insert may still commit
+                raise
+            if lease_id is None:
+                return None, tenant_full
+        self.active += 1
+        self.active_by_tenant[tenant] += 1
+        return Ticket(tenant, lease_id, time.monotonic()), False
+
+    def _queue_open(self) -> bool:
+        # no overtaking, except past waiters that only their own tenant limit holds back
+        return all(tenant_full for _, _, tenant_full in self._waiters)
+
+    def retry_after(self) -> int:
+        """Rough time until a queued request would be admitted."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_hold * backlog / self.max_concurrent))
+
+    async def acquire(self, tenant: str) -> Ticket:
+        t0 = time.monotonic()
+        ticket, tenant_full = (await self._try_admit(tenant)) if self._queue_open() else (None, False)
+        if ticket is None:
+            if len(self._waiters) >= self.queue_max:
+                self.rejected_queue_full += 1
+                raise Rejected("admission queue full", self.retry_after())
+            ticket = await self._wait(tenant, t0 + self.max_wait, tenant_full)
+        self.admitted += 1
+        self._waits_ms.append((ticket.admitted_at - t0) * 1000)
+        return ticket
+
+    async def _wait(self, tenant: str, deadline: float, tenant_full: bool) -> Ticket:
+        loop = asyncio.get_running_loop()
+        waiter = [tenant, None, tenant_full]
+        self._waiters.append(waiter)
+        poll = SHARED_POLL_SECONDS if _shared() else None
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected_timeout += 1
+                    raise Rejected("timed out waiting for a pipeline slot", self.retry_after())
+                waiter[1] = loop.create_future()
+                try:
+                    await asyncio.wait_for(waiter[1], timeout=min(remaining, poll or remaining))
+                except asyncio.TimeoutError:
+                    pass
+                ticket, waiter[2] = await self._try_admit(tenant)
+                if ticket is not None:
+                    return ticket
+        finally:
+            self._waiters.remove(waiter)
+            if self._waiters and self.active < self.max_concurrent:
+                self._wake()  # pass on a wake-up this waiter did not use
+
+    async def release(self, ticket: Ticket) -> None:
+        self.active -= 1
+        self.active_by_tenant[ticket.tenant] -= 1
+        if self.active_by_tenant[ticket.tenant] <= 0:
+            del self.active_by_tenant[ticket.tenant]
+        self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.monotonic() - ticket.admitted_at)
+        try:
+            if ticket.lease_id is not None:
+                await asyncio.to_thread(_release_lease, ticket.lease_id)
+        finally:
+            self._wake()
+
+    def _wake(self) -> None:
+        # wake every waiter (FIFO order); each re-checks its own tenant limit.
+        # Until it has, it holds its place in the queue again.
+        for waiter in self._waiters:
+            waiter[2] = False
+            fut = waiter[1]
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, tenant: Optional[str]) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire((tenant or "").strip()[:100] or DEFAULT_TENANT)
+        try:
+            yield ticket
+        finally:
+            await self.release(ticket)
+
+    # ---------- metrics ----------
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self._waits_ms)
+        return {
+            "limits": {
+                "max_concurrent": self.max_concurrent,
+                "tenant_max_concurrent": self.tenant_max_concurrent,
+                "queue_max": self.queue_max,
+                "max_wait_seconds": self.max_wait,
+            },
+            "active": self.active,
+            "active_by_tenant": dict(self.active_by_tenant),
+            "queue_depth": len(self._waiters),
+            "queue_depth_by_tenant": dict(Counter(t for t, _, _ in self._waiters)),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits), 1) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+                "max": round(waits[-1], 1) if waits else 0.0,
+            },
+            "avg_run_seconds": round(self._avg_hold, 2),
+        }
+
+
+limiter = Limiter()
@@ -3,12 +3,7 @@ from typing import Dict, Any
 from agents.base import AgentBase
 from db import SessionLocal, Employee, Account
 from sqlalchemy.orm import Session
-
-ROLE_PERMISSIONS = {
-    "AI Engineer": ["repo:read", "inference:run", "data:read"],
-    "Backend Engineer": ["repo:read", "deploy:trigger"],
-    "HR": ["employee:read", "employee:write"],
-}
+from validation import ROLE_PERMISSIONS
 
 class AccountAgent(AgentBase):
     name = "Account"
@@ -51,10 +46,10 @@ class AccountAgent(AgentBase):
                 self.step("Account created", {"username": acc.username})
 
             # A2A: call Scheduler (Scheduler จะกันซ้ำอีกชั้นเอง)
-            from agents.scheduler_agent import SchedulerAgent
-            sched = SchedulerAgent()
-            sres = await sched.run(employee_id)
-            self.step("A2A call to Scheduler completed", {"scheduler_log_id": sres["log_id"]})
+            # remote JSON-RPC service when configured, otherwise in-process
+            from scheduler_service import create_event
+            sres = await create_event(employee_id)
+            self.step("A2A call to Scheduler completed", {"scheduler_log_id": sres["log_id"], "transport": sres["transport"]})
 
             output = {"username": acc.username, "permissions": acc.permissions}
             log_id = self.persist_log(employee_id, {"employee_id": emp.id}, output, status="OK")
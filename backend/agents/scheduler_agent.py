@@ -2,7 +2,8 @@ from typing import Dict, Any
 from agents.base import AgentBase
 from db import SessionLocal, Employee, CalendarEvent
 from settings import SIMULATE_INTEGRATIONS, DEFAULT_TZ, DEFAULT_LOCATION
-from agents.llm_utils import llm_propose_orientation_event, have_llm
+from agents.llm_utils import have_llm
+import precompute
 
 class SchedulerAgent(AgentBase):
     name = "Scheduler"
@@ -21,7 +22,7 @@ class SchedulerAgent(AgentBase):
             else:
                 event = None
                 if have_llm():
-                    ai = await llm_propose_orientation_event(emp.name, emp.email, str(emp.start_date), emp.role, tz=DEFAULT_TZ or "Asia/Bangkok")
+                    ai, cached = await precompute.get_or_compute(emp.id, precompute.ORIENTATION, precompute.orientation_inputs(emp))
                     if isinstance(ai, dict) and "start" in ai and "end" in ai:
                         event = {
                             "summary": f"Day-1 Orientation: {emp.name}",
@@ -33,7 +34,7 @@ class SchedulerAgent(AgentBase):
                             "status": "confirmed",
                             "simulate": SIMULATE_INTEGRATIONS,
                         }
-                        self.step("AI-proposed event", {"start": event["start"], "end": event["end"], "location": event["location"]})
+                        self.step("AI-proposed event", {"start": event["start"], "end": event["end"], "location": event["location"], "precomputed": cached})
                 if not event:
                     event = {
                         "summary": f"Day-1 Orientation: {emp.name}",
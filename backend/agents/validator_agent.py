@@ -1,8 +1,8 @@
-import re
 from typing import Dict, Any
 from agents.base import AgentBase
 from db import SessionLocal, Employee
-from agents.llm_utils import llm_normalize_employee
+from validation import check_fields
+import precompute
 
 class ValidatorAgent(AgentBase):
     name = "Validator"
@@ -20,18 +20,11 @@ class ValidatorAgent(AgentBase):
             }
             self.step("Loaded employee", input_data)
 
-            errors = []
-            if not re.match(r"[^@]+@[^@]+\.[^@]+", emp.email or ""):
-                errors.append("Invalid email format")
-            if not emp.name or len(emp.name.strip()) < 2:
-                errors.append("Name too short")
-            if not emp.role:
-                errors.append("Role is required")
-
+            errors = check_fields(emp.name, emp.email, emp.role)
             self.step("Rule-based checks completed", {"errors": errors})
 
-            llm_info = await llm_normalize_employee(input_data)
-            self.step("LLM normalization", llm_info)
+            llm_info, cached = await precompute.get_or_compute(emp.id, precompute.NORMALIZE, input_data)
+            self.step("LLM normalization (precomputed)" if cached else "LLM normalization", llm_info)
 
             output = {"errors": errors, "llm": llm_info}
             status = "OK" if not errors else "WARN"
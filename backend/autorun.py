@@ -0,0 +1,144 @@
+"""
+Start-date-driven auto-run scheduler.
+
+Periodically picks PENDING (non-archived) employees whose start_date falls
+within AUTORUN_HORIZON_DAYS and runs their pipelines in batches, only inside
+the off-peak AUTORUN_WINDOW, with a concurrency cap and per-run jitter.
+Each run takes an admission slot as tenant "autorun" (see admission.py), so
+auto-runs count toward ADMISSION_MAX_CONCURRENT like API runs.
+Exactly one process polls at a time: leadership is a Postgres advisory lock
+held on a dedicated connection (any process can take over if the leader dies).
+
+Runs either as a lifespan task (AUTORUN_ENABLED=true) or standalone:
+    python autorun.py          # loop forever
+    python autorun.py --once   # one poll, ignoring the window
+"""
+import asyncio
+import logging
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+
+from db import SessionLocal, Employee, Leader
+import admission
+from settings import (
+    AUTORUN_INTERVAL_SECONDS,
+    AUTORUN_HORIZON_DAYS,
+    AUTORUN_WINDOW,
+    AUTORUN_BATCH_SIZE,
+    AUTORUN_CONCURRENCY,
+    AUTORUN_JITTER_SECONDS,
+    DEFAULT_TZ,
+)
+import runner
+
+logger = logging.getLogger("krnl.autorun")
+
+LEADER_LOCK_KEY = 72_610_033
+ADMISSION_TENANT = "autorun"
+
+
+def parse_window(spec: str) -> Optional[Tuple[time, time]]:
+    """'22:00-06:00' or '22-6' -> (start, end); empty means always open."""
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    a, b = spec.split("-", 1)
+
+    def _t(x: str) -> time:
+        h, _, m = x.strip().partition(":")
+        return time(int(h), int(m or 0))
+
+    return _t(a), _t(b)
+
+
+def in_window(now: time, window: Optional[Tuple[time, time]]) -> bool:
+    if window is None:
+        return True
+    start, end = window
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end  # wraps past midnight
+
+
+def due_employee_ids(today: date, horizon_days: int, limit: int) -> List[int]:
+    """Index range scan on ix_employees_active_status_start."""
+    db = SessionLocal()
+    try:
+        return list(db.scalars(
+            select(Employee.id)
+            .where(
+                Employee.status == "PENDING",
+                Employee.archived_at.is_(None),
+                Employee.start_date >= today,
+                Employee.start_date <= today + timedelta(days=horizon_days),
+            )
+            .order_by(Employee.start_date, Employee.id)
+            .limit(limit)
+        ))
+    finally:
+        db.close()
+
+
+async def run_batch(ids: List[int], concurrency: int, jitter: float) -> int:
+    """Run pipelines with at most `concurrency` in flight; returns how many succeeded."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(eid: int) -> bool:
+        async with sem:
+            await asyncio.sleep(random.uniform(0, jitter))
+            try:
+                if runner.is_inflight(eid):
+                    await runner.run_employee(eid)
+                else:
+                    async with admission.limiter.slot(ADMISSION_TENANT):
+                        await runner.run_employee(eid)
+                return True
+            except admission.Rejected as ex:
+                logger.info("autorun: employee %s not admitted (%s), retried next poll", eid, ex)
+                return False
+            except Exception:
+                logger.exception("autorun: employee %s failed", eid)
+                return False
+
+    return sum(await asyncio.gather(*(_one(i) for i in ids)))
+
+
+async def poll_once(leader: Leader, respect_window: bool = True) -> int:
+    tz = ZoneInfo(DEFAULT_TZ or "Asia/Bangkok")
+    now = datetime.now(tz)
+    if respect_window and not in_window(now.time(), parse_window(AUTORUN_WINDOW)):
+        return 0
+    if not await asyncio.to_thread(leader.ensure):
+        return 0
+    ids = await asyncio.to_thread(due_employee_ids, now.date(), AUTORUN_HORIZON_DAYS, AUTORUN_BATCH_SIZE)
+    if not ids:
+        return 0
+    ok = await run_batch(ids, AUTORUN_CONCURRENCY, AUTORUN_JITTER_SECONDS)
+    logger.info("autorun: ran %d/%d due employees", ok, len(ids))
+    return len(ids)
+
+
+async def autorun_loop() -> None:
+    leader = Leader(LEADER_LOCK_KEY, "autorun")
+    try:
+        while True:
+            try:
+                await poll_once(leader)
+            except Exception:
+                logger.exception("autorun: poll failed")
+            await asyncio.sleep(AUTORUN_INTERVAL_SECONDS * random.uniform(0.9, 1.1))
+    finally:
+        leader.release()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if "--once" in sys.argv[1:]:
+        asyncio.run(poll_once(Leader(LEADER_LOCK_KEY, "autorun"), respect_window=False))
+    else:
+        asyncio.run(autorun_loop())
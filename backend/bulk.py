@@ -0,0 +1,107 @@
+"""
+Set-based bulk delete / archive of employees.
+
+IDs are processed in chunks; each chunk is one transaction that touches every
+child table with a single statement per table, which bounds lock time while
+keeping each chunk atomic. Dashboard counters are adjusted in the same
+transaction (archived employees are not counted).
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import Integer, any_, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from db import Employee, Account, CalendarEvent, Notification, AgentLog, LlmArtefact
+from schemas import EmployeeFilter
+import stats
+
+CHUNK_SIZE = 500
+CHILD_TABLES = (AgentLog, Notification, CalendarEvent, Account, LlmArtefact)
+
+
+def _id_in(db: Session, column, ids: Sequence[int]):
+    """`column = ANY(:ids)` on Postgres (one array parameter), IN (...) elsewhere."""
+    if db.get_bind().dialect.name == "postgresql":
+        return column == any_(literal(list(ids), ARRAY(Integer)))
+    return column.in_(ids)
+
+
+def select_ids(db: Session, ids: Optional[List[int]] = None, flt: Optional[EmployeeFilter] = None) -> List[int]:
+    """Resolve an explicit ID list or a filter to existing employee IDs."""
+    q = select(Employee.id)
+    if ids is not None:
+        q = q.where(Employee.id.in_(ids))
+    if flt is not None:
+        if flt.status:
+            q = q.where(Employee.status.in_(flt.status))
+        if flt.department:
+            q = q.where(Employee.department == flt.department)
+        if flt.start_from:
+            q = q.where(Employee.start_date >= flt.start_from)
+        if flt.start_to:
+            q = q.where(Employee.start_date <= flt.start_to)
+        if flt.archived is not None:
+            q = q.where(Employee.archived_at.isnot(None) if flt.archived else Employee.archived_at.is_(None))
+    return list(db.scalars(q.order_by(Employee.id)))
+
+
+def _uncount(db: Session, chunk: Sequence[int]) -> None:
+    """Remove the chunk's active (non-archived) employees from the dashboard counters."""
+    # lock the rows first so a concurrent run's status change cannot slip in between
+    db.execute(select(Employee.id).where(_id_in(db, Employee.id, chunk)).with_for_update())
+    rows = db.execute(
+        select(Employee.status, Employee.department, Employee.start_date, func.count())
+        .where(_id_in(db, Employee.id, chunk), Employee.archived_at.is_(None))
+        .group_by(Employee.status, Employee.department, Employee.start_date)
+    ).all()
+    stats.apply_deltas(db, stats.deltas_for(rows, sign=-1))
+
+
+def delete_employees(db: Session, ids: Sequence[int]) -> Dict[str, int]:
+    """Delete employees and all child rows; returns rows deleted per table."""
+    counts: Dict[str, int] = defaultdict(int)
+    for i in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[i:i + CHUNK_SIZE]
+        try:
+            _uncount(db, chunk)
+            for model in CHILD_TABLES:
+                res = db.execute(
+                    delete(model).where(_id_in(db, model.employee_id, chunk)),
+                    execution_options={"synchronize_session": False},
+                )
+                counts[model.__tablename__] += res.rowcount
+            res = db.execute(
+                delete(Employee).where(_id_in(db, Employee.id, chunk)),
+                execution_options={"synchronize_session": False},
+            )
+            counts[Employee.__tablename__] += res.rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return dict(counts)
+
+
+def archive_employees(db: Session, ids: Sequence[int]) -> Dict[str, int]:
+    """Flag employees as archived: rows are kept but leave the active (partial) indexes and counters."""
+    archived = 0
+    now = datetime.now(timezone.utc)
+    for i in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[i:i + CHUNK_SIZE]
+        try:
+            _uncount(db, chunk)
+            res = db.execute(
+                update(Employee)
+                .where(_id_in(db, Employee.id, chunk), Employee.archived_at.is_(None))
+                .values(archived_at=now),
+                execution_options={"synchronize_session": False},
+            )
+            archived += res.rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return {Employee.__tablename__: archived}
@@ -1,12 +1,182 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, JSON, ForeignKey, Text
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+import logging
+
+from sqlalchemy import create_engine, event, text, Column, Integer, Float, String, Date, DateTime, JSON, ForeignKey, Text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.sql import func
-from settings import DATABASE_URL
+import profiling
+from settings import (
+    DATABASE_URL,
+    DATABASE_READ_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_TIMEOUT,
+)
+
+logger = logging.getLogger("krnl.db")
+
+_engine = None
+_read_engine = None
+
+
+# local/test profile: WAL lets readers run alongside the single writer
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "foreign_keys=ON",
+    "busy_timeout=5000",
+    "temp_store=MEMORY",
+    "cache_size=-16000",
+)
+
+
+def _sqlite_in_memory(url: str) -> bool:
+    u = make_url(url)
+    return u.database in (None, "", ":memory:") or u.query.get("mode") == "memory"
+
+
+def _set_sqlite_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cur.execute(f"PRAGMA {pragma}")
+    finally:
+        cur.close()
+
+
+def _create_engine(url: str):
+    kw = {"pool_pre_ping": True, "future": True}
+    if url.startswith("sqlite"):
+        kw["connect_args"] = {"check_same_thread": False}
+        if _sqlite_in_memory(url):
+            # one shared connection: every new connection would be a new, empty database
+            kw["poolclass"] = StaticPool
+    else:
+        kw.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    engine = create_engine(url, **kw)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    profiling.install_query_hooks(engine)
+    return engine
+
+
+def get_engine():
+    """Create the engine on first use so importing this module never touches the DB."""
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(DATABASE_URL)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_read_engine():
+    """Replica engine when DATABASE_READ_URL is set, otherwise the primary."""
+    global _read_engine
+    if not DATABASE_READ_URL:
+        return get_engine()
+    if _read_engine is None:
+        _read_engine = _create_engine(DATABASE_READ_URL)
+    return _read_engine
+
+
+def dispose_engine() -> None:
+    global _engine, _read_engine
+    for eng in (_engine, _read_engine):
+        if eng is not None:
+            eng.dispose()
+    _engine = _read_engine = None
+
+
+def use_database(url: str):
+    """Point this process at another database (e.g. the replay.py scratch DB); reads included."""
+    global _engine, _read_engine
+    dispose_engine()
+    _engine = _read_engine = _create_engine(url)
+    SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def has_replica() -> bool:
+    return bool(DATABASE_READ_URL)
+
+
+class Leader:
+    """Advisory-lock leadership held on a dedicated connection; always leader off Postgres."""
+
+    def __init__(self, key: int, name: str):
+        self.key = key
+        self.name = name
+        self._conn = None
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+    def ensure(self) -> bool:
+        engine = get_engine()
+        if engine.dialect.name != "postgresql":
+            return True
+        try:
+            if self._conn is not None:
+                self._conn.execute(text("SELECT 1"))
+                return True
+        except Exception:
+            self._conn = None  # connection (and with it the lock) is gone
+        conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        if conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": self.key}).scalar():
+            self._conn = conn
+            logger.info("%s: acquired leadership", self.name)
+            return True
+        conn.close()
+        return False
+
+    def release(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": self.key})
+            finally:
+                self._conn.close()
+                self._conn = None
+
+
+def insert_for(db):
+    """Dialect-specific insert() (supports on_conflict_*) for the session's bind."""
+    name = db.get_bind().dialect.name
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f"upserts are not supported on {name}")
+    return insert
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+class RoutingSession(Session):
+    """
+    Sends SELECTs to the read replica and anything that writes to the primary.
+    Set session.info["primary"] = True to pin every statement to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or self.info.get("primary") or (clause is not None and clause.is_dml):
+            return get_engine()
+        return get_read_engine()
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False, future=True)
+ReadSessionLocal = _LazySessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, future=True)
 Base = declarative_base()
 
+
 class Employee(Base):
     __tablename__ = "employees"
     id = Column(Integer, primary_key=True)
@@ -19,6 +189,7 @@ class Employee(Base):
     raw_payload = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    archived_at = Column(DateTime(timezone=True), nullable=True)
 
     account = relationship("Account", back_populates="employee", uselist=False, cascade="all, delete-orphan")
     events = relationship("CalendarEvent", back_populates="employee", cascade="all, delete-orphan")
@@ -65,5 +236,63 @@ class AgentLog(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     employee = relationship("Employee", back_populates="logs")
 
+class EmployeeCounter(Base):
+    """Pre-aggregated employee counts served by /api/stats (maintained by stats.py)."""
+    __tablename__ = "employee_counters"
+    status = Column(String, primary_key=True)
+    department = Column(String, primary_key=True)
+    start_week = Column(Date, primary_key=True)
+    n = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    """Stored responses replayed for retried requests carrying an Idempotency-Key header."""
+    __tablename__ = "idempotency_keys"
+    key = Column(String, primary_key=True)
+    path = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class RunProfile(Base):
+    """Sampled pipeline run: folded stacks (flame-graph input) + slow queries, linked to AgentLog ids."""
+    __tablename__ = "run_profiles"
+    id = Column(Integer, primary_key=True)
+    employee_id = Column(Integer, nullable=False, index=True)
+    trace_ids = Column(JSON, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    samples = Column(Integer, nullable=False, default=0)
+    folded = Column(Text, nullable=True)
+    slow_queries = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LlmArtefact(Base):
+    """Precomputed LLM output per employee, valid while `fingerprint` matches the current inputs."""
+    __tablename__ = "llm_artefacts"
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AdmissionLease(Base):
+    """One running pipeline slot; the row count is the deployment-wide concurrency (see admission.py)."""
+    __tablename__ = "admission_leases"
+    id = Column(Integer, primary_key=True)
+    tenant = Column(String(100), nullable=False, index=True)
+    holder = Column(String(100), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ProfilingSetting(Base):
+    """Deployment-wide profiling settings (single row, id=1); NULL keeps the worker's env default."""
+    __tablename__ = "profiling_settings"
+    id = Column(Integer, primary_key=True)
+    sample_rate = Column(Float, nullable=True)
+    interval_ms = Column(Float, nullable=True)
+    slow_query_ms = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """Dev/test helper: bring the schema up to date. Deployments run `python migrate.py`."""
+    from migrate import upgrade
+    upgrade(get_engine())
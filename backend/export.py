@@ -0,0 +1,138 @@
+"""
+Streaming audit export: employees + account permissions + calendar events +
+latest agent log status, as CSV or NDJSON, optionally gzipped.
+
+Rows are produced page by page (keyset on employees.id). Each page is a short
+read transaction streamed with a server-side cursor (yield_per), so memory
+stays flat and no single transaction spans the whole export.
+Temporary passwords are never exported.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, select
+
+from db import ReadSessionLocal, Employee, Account, CalendarEvent, AgentLog
+
+PAGE_SIZE = 2000
+YIELD_PER = 500
+
+COLUMNS = [
+    "employee_id", "name", "email", "role", "department", "start_date", "status", "created_at", "archived_at",
+    "username", "permissions",
+    "calendar_event_id", "event_start", "event_end", "event_location",
+    "last_agent", "last_agent_status", "last_agent_at",
+]
+
+
+def _filters(start_from: Optional[date], start_to: Optional[date], department: Optional[str]) -> List[Any]:
+    out = []
+    if start_from:
+        out.append(Employee.start_date >= start_from)
+    if start_to:
+        out.append(Employee.start_date <= start_to)
+    if department:
+        out.append(Employee.department == department)
+    return out
+
+
+def _iso(v: Any) -> Optional[str]:
+    return v.isoformat() if v is not None else None
+
+
+def iter_records(
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    department: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    where = _filters(start_from, start_to, department)
+    last_id = 0
+    while True:
+        with ReadSessionLocal() as db:
+            ids = db.scalars(
+                select(Employee.id).where(Employee.id > last_id, *where).order_by(Employee.id).limit(PAGE_SIZE)
+            ).all()
+            if not ids:
+                return
+            latest = (
+                select(AgentLog.employee_id, func.max(AgentLog.id).label("log_id"))
+                .where(AgentLog.employee_id.in_(ids))
+                .group_by(AgentLog.employee_id)
+                .subquery()
+            )
+            stmt = (
+                select(
+                    Employee.id.label("employee_id"), Employee.name, Employee.email, Employee.role,
+                    Employee.department, Employee.start_date, Employee.status, Employee.created_at,
+                    Employee.archived_at, Account.username, Account.permissions,
+                    CalendarEvent.id.label("calendar_event_id"), CalendarEvent.event_json,
+                    AgentLog.agent.label("last_agent"),
+                    AgentLog.status.label("last_agent_status"),
+                    AgentLog.created_at.label("last_agent_at"),
+                )
+                .where(Employee.id.in_(ids))
+                .outerjoin(Account, Account.employee_id == Employee.id)
+                .outerjoin(CalendarEvent, CalendarEvent.employee_id == Employee.id)
+                .outerjoin(latest, latest.c.employee_id == Employee.id)
+                .outerjoin(AgentLog, AgentLog.id == latest.c.log_id)
+                .order_by(Employee.id, CalendarEvent.id)
+                .execution_options(yield_per=YIELD_PER)
+            )
+            for r in db.execute(stmt):
+                ev = r.event_json or {}
+                yield {
+                    "employee_id": r.employee_id,
+                    "name": r.name,
+                    "email": r.email,
+                    "role": r.role,
+                    "department": r.department,
+                    "start_date": _iso(r.start_date),
+                    "status": r.status or "PENDING",
+                    "created_at": _iso(r.created_at),
+                    "archived_at": _iso(r.archived_at),
+                    "username": r.username,
+                    "permissions": r.permissions,
+                    "calendar_event_id": r.calendar_event_id,
+                    "event_start": (ev.get("start") or {}).get("dateTime"),
+                    "event_end": (ev.get("end") or {}).get("dateTime"),
+                    "event_location": ev.get("location"),
+                    "last_agent": r.last_agent,
+                    "last_agent_status": r.last_agent_status,
+                    "last_agent_at": _iso(r.last_agent_at),
+                }
+        last_id = ids[-1]
+
+
+def as_ndjson(records: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    for rec in records:
+        yield (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def as_csv(records: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=COLUMNS)
+    w.writeheader()
+    n = 0
+    for rec in records:
+        if rec["permissions"] is not None:
+            rec = {**rec, "permissions": json.dumps(rec["permissions"])}
+        w.writerow(rec)
+        n += 1
+        if n % YIELD_PER == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
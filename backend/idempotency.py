@@ -0,0 +1,56 @@
+"""
+Idempotency-Key support: the first successful response for a key is stored and
+replayed verbatim for retries of the same request within IDEMPOTENCY_TTL_HOURS.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy.orm import Session
+
+from db import IdempotencyKey, insert_for
+from settings import IDEMPOTENCY_TTL_HOURS
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+_PURGE_EVERY = 100
+_stores = 0
+
+
+class KeyReused(Exception):
+    """Same key sent for a different request."""
+
+
+def _cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+
+
+def lookup(db: Session, key: str, path: str) -> Optional[IdempotencyKey]:
+    rec = db.get(IdempotencyKey, key)
+    if rec is None:
+        return None
+    created = rec.created_at
+    if created is not None and created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    if created is not None and created < _cutoff():
+        return None
+    if rec.path != path:
+        raise KeyReused(f"{HEADER} already used for {rec.path}")
+    return rec
+
+
+def store(db: Session, key: str, path: str, status_code: int, response: Any) -> None:
+    """Record the response; an expired record under the same key is overwritten."""
+    global _stores
+    insert = insert_for(db)
+    values = {"key": key, "path": path, "status_code": status_code, "response": response}
+    stmt = insert(IdempotencyKey).values(**values, created_at=datetime.now(timezone.utc))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["key"],
+        set_={**values, "created_at": stmt.excluded.created_at},
+        where=IdempotencyKey.created_at < _cutoff(),
+    )
+    db.execute(stmt)
+    _stores += 1
+    if _stores % _PURGE_EVERY == 0:
+        db.query(IdempotencyKey).filter(IdempotencyKey.created_at < _cutoff()).delete(synchronize_session=False)
+    db.commit()
@@ -1,21 +1,87 @@
 import io
 import os
 import csv
+import json
+import time
 import asyncio
-from datetime import date, datetime
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
-from db import init_db, SessionLocal, Employee, AgentLog
-from orchestrator import orchestrator
-from settings import API_HOST, API_PORT, API_LOG_LEVEL
+from sqlalchemy import text
+
+from db import (
+    get_engine,
+    init_db,
+    dispose_engine,
+    has_replica,
+    SessionLocal,
+    ReadSessionLocal,
+    Employee,
+    AgentLog,
+    RunProfile,
+)
+from schemas import BulkRequest, ProfilingSettings
+from settings import (
+    API_HOST,
+    API_PORT,
+    API_LOG_LEVEL,
+    AUTORUN_ENABLED,
+    DB_READ_STICKY_SECONDS,
+    OPENAI_API_KEY,
+    PRECOMPUTE_ENABLED,
+    PROFILE_SETTINGS_REFRESH_SECONDS,
+    STATS_RECONCILE_SECONDS,
+)
+import admission
+import bulk
+import export
+import idempotency
+import precompute
+import profiling
+import runner
+import search
+import stats
+from validation import parse_date as _parse_date, validate_rows, REQUIRED_FIELDS
+
+_BOOT_T0 = time.perf_counter()
+logger = logging.getLogger("krnl")
+STARTUP_MS: Optional[float] = None
+
 
 # ---------- App ----------
-app = FastAPI(title="KRNL Onboarding")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engine is created here (no connection yet); schema is owned by `python migrate.py`,
+    # except for the embedded SQLite profile, which migrates in-process (in-memory DBs start empty).
+    global STARTUP_MS
+    if get_engine().dialect.name == "sqlite":
+        init_db()
+    STARTUP_MS = round((time.perf_counter() - _BOOT_T0) * 1000, 1)
+    logger.info("worker ready in %.1f ms", STARTUP_MS)
+    tasks = []
+    if STATS_RECONCILE_SECONDS > 0:
+        tasks.append(asyncio.create_task(stats.reconcile_loop(STATS_RECONCILE_SECONDS)))
+    if PROFILE_SETTINGS_REFRESH_SECONDS > 0:
+        tasks.append(asyncio.create_task(profiling.settings_loop(PROFILE_SETTINGS_REFRESH_SECONDS)))
+    if PRECOMPUTE_ENABLED and OPENAI_API_KEY:
+        tasks.append(asyncio.create_task(precompute.worker_loop()))
+    if AUTORUN_ENABLED:
+        import autorun
+        tasks.append(asyncio.create_task(autorun.autorun_loop()))
+    yield
+    for t in tasks:
+        t.cancel()
+    dispose_engine()
+
+
+app = FastAPI(title="KRNL Onboarding", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,13 +90,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# static
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# read-your-writes across API replicas: a client that just wrote reads from the primary
+STICKY_COOKIE = "krnl_primary"
+
 
-# init DB at startup
-init_db()
+@app.middleware("http")
+async def sticky_primary(request: Request, call_next):
+    response = await call_next(request)
+    if has_replica() and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(STICKY_COOKIE, "1", max_age=max(1, int(DB_READ_STICKY_SECONDS)), httponly=True)
+    return response
 
 
+# static
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
 # ---------- Helpers ----------
 def get_db():
     db = SessionLocal()
@@ -40,19 +114,36 @@ def get_db():
         db.close()
 
 
-def _parse_date(s: str) -> date:
-    """Support YYYY-MM-DD, DD/MM/YYYY, MM/DD/YYYY."""
-    s = (s or "").strip()
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except Exception:
-            pass
-    # try ISO loose
+def get_read_db(request: Request):
+    """Session for read-only endpoints: replica unless this client just wrote (sticky cookie)."""
+    db = ReadSessionLocal()
+    if request.cookies.get(STICKY_COOKIE):
+        db.info["primary"] = True
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ---------- Probes ----------
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up. Never touches the DB."""
+    return {"ok": True}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: DB reachable and schema migrated to the version this build expects."""
+    from migrate import current_version, LATEST_VERSION
     try:
-        return date.fromisoformat(s)
-    except Exception:
-        raise ValueError("Invalid date format (use YYYY-MM-DD, DD/MM/YYYY, or MM/DD/YYYY)")
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+            version = current_version(conn)
+    except Exception as ex:
+        return JSONResponse({"ok": False, "error": str(ex)}, status_code=503)
+    body = {"ok": version >= LATEST_VERSION, "schema_version": version, "startup_ms": STARTUP_MS}
+    return JSONResponse(body, status_code=200 if body["ok"] else 503)
 
 
 # ---------- API: UI ----------
@@ -63,8 +154,8 @@ def index():
 
 # ---------- API: Employees ----------
 @app.get("/api/employees")
-def list_employees(db=Depends(get_db)):
-    items = db.query(Employee).order_by(Employee.id.desc()).all()
+def list_employees(db=Depends(get_read_db)):
+    items = db.query(Employee).filter(Employee.archived_at.is_(None)).order_by(Employee.id.desc()).all()
     out = []
     for e in items:
         out.append({
@@ -79,6 +170,16 @@ def list_employees(db=Depends(get_db)):
     return out
 
 
+@app.get("/api/employees/search")
+def search_employees(q: str = "", limit: int = 20, offset: int = 0, db=Depends(get_read_db)):
+    """Ranked prefix/fuzzy search over name, email, role and department."""
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    # fetch one extra row to report has_more without a COUNT(*)
+    items = search.search_employees(db, q, limit=limit + 1, offset=offset)
+    return {"items": items[:limit], "limit": limit, "offset": offset, "has_more": len(items) > limit}
+
+
 @app.post("/api/employees")
 def create_employee(
     name: str = Form(...),
@@ -102,8 +203,10 @@ def create_employee(
         status="PENDING",
     )
     db.add(e)
+    stats.on_insert(db, e)
     db.commit()
     db.refresh(e)
+    precompute.enqueue([(e.id, e.start_date)])
     return {"ok": True, "id": e.id}
 
 
@@ -112,13 +215,31 @@ def delete_employee(employee_id: int, db=Depends(get_db)):
     e = db.get(Employee, employee_id)
     if not e:
         raise HTTPException(status_code=404, detail="Employee not found")
-    # manual cascade for logs (extend if you have other tables)
-    db.query(AgentLog).filter(AgentLog.employee_id == employee_id).delete(synchronize_session=False)
-    db.delete(e)
-    db.commit()
+    # set-based cascade over every child table (see bulk.py)
+    bulk.delete_employees(db, [employee_id])
     return {"ok": True}
 
 
+def _bulk_ids(req: BulkRequest, db) -> List[int]:
+    if (req.ids is None) == (req.filter is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'ids' or 'filter'")
+    if req.filter is not None and not req.filter.model_dump(exclude_none=True):
+        raise HTTPException(status_code=400, detail="Filter must have at least one criterion")
+    return bulk.select_ids(db, ids=req.ids, flt=req.filter)
+
+
+@app.post("/api/employees/bulk_delete")
+def bulk_delete(req: BulkRequest, db=Depends(get_db)):
+    ids = _bulk_ids(req, db)
+    return {"ok": True, "matched": len(ids), "deleted": bulk.delete_employees(db, ids)}
+
+
+@app.post("/api/employees/bulk_archive")
+def bulk_archive(req: BulkRequest, db=Depends(get_db)):
+    ids = _bulk_ids(req, db)
+    return {"ok": True, "matched": len(ids), "archived": bulk.archive_employees(db, ids)}
+
+
 # ---------- API: CSV Upload / Sample ----------
 @app.post("/api/employees/upload_csv")
 async def upload_csv(file: UploadFile = File(...), db=Depends(get_db)):
@@ -127,15 +248,18 @@ async def upload_csv(file: UploadFile = File(...), db=Depends(get_db)):
 
     content = (await file.read()).decode("utf-8", errors="ignore")
     reader = csv.DictReader(io.StringIO(content))
-    required = {"name", "email", "role", "start_date"}
+    required = set(REQUIRED_FIELDS)
     missing = [h for h in required if h not in reader.fieldnames]
     if missing:
         raise HTTPException(status_code=400, detail=f"Missing headers: {', '.join(missing)}")
 
     inserted = skipped = errors = 0
     error_rows: List[Dict[str, Any]] = []
+    new_counts: Dict[Any, int] = defaultdict(int)
+    new_rows: List[Employee] = []
+    seen = set()  # (email, start_date) already added from this file
 
-    for idx, row in enumerate(reader, start=2):  # start=2 to account for header line
+    for idx, row in enumerate(reader, start=1):  # row numbers as in /api/validate; line = idx + 1
         try:
             name = (row.get("name") or "").strip()
             email = (row.get("email") or "").strip()
@@ -147,15 +271,17 @@ async def upload_csv(file: UploadFile = File(...), db=Depends(get_db)):
                 skipped += 1
                 continue
 
-            # idempotent-ish: skip if same email & start_date already exists
+            # idempotent-ish: skip if an active employee has the same email & start_date
+            # (archived hires do not block a re-import; uses ix_employees_active_email_start)
             exists = (
-                db.query(Employee)
-                .filter(Employee.email == email, Employee.start_date == sd)
+                db.query(Employee.id)
+                .filter(Employee.email == email, Employee.start_date == sd, Employee.archived_at.is_(None))
                 .first()
             )
-            if exists:
+            if exists or (email, sd) in seen:
                 skipped += 1
                 continue
+            seen.add((email, sd))
 
             e = Employee(
                 name=name,
@@ -166,11 +292,18 @@ async def upload_csv(file: UploadFile = File(...), db=Depends(get_db)):
                 status="PENDING",
             )
             db.add(e)
+            new_counts[stats.key_for(e.status, department, sd)] += 1
+            new_rows.append(e)
             inserted += 1
         except Exception as ex:
             errors += 1
-            error_rows.append({"line": idx, "error": str(ex)})
+            error_rows.append({"row": idx, "line": idx + 1, "error": str(ex)})
+    stats.apply_deltas(db, new_counts)
+    db.flush()
+    # read ids before commit: afterwards every row is expired and would be re-SELECTed one by one
+    new_keys = [(e.id, e.start_date) for e in new_rows]
     db.commit()
+    precompute.enqueue(new_keys)
 
     return {
         "ok": True,
@@ -194,53 +327,184 @@ def download_sample_csv():
     )
 
 
+# ---------- API: Preflight validation (no DB, no LLM) ----------
+@app.post("/api/validate")
+async def validate_upload(request: Request, errors_only: bool = False):
+    """
+    Validate a CSV file (multipart "file" or raw text/csv body) or a JSON array of rows.
+    Streams one NDJSON diagnostic per row followed by a {"summary": ...} line.
+    Rows are numbered from 1 in input order (CSV: the first line after the header).
+    """
+    ctype = request.headers.get("content-type", "")
+    if ctype.startswith("application/json"):
+        try:
+            rows = await request.json()
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of rows")
+    else:
+        if ctype.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or not hasattr(upload, "read"):
+                raise HTTPException(status_code=400, detail="Missing form field: file")
+            raw = await upload.read()
+        else:
+            raw = await request.body()
+        reader = csv.DictReader(io.StringIO(raw.decode("utf-8", errors="ignore")))
+        missing = [h for h in REQUIRED_FIELDS if h not in (reader.fieldnames or [])]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing headers: {', '.join(missing)}")
+        rows = reader
+
+    def _stream():
+        total = ok = warned = 0
+        for diag in validate_rows(rows):
+            total += 1
+            ok += diag["ok"]
+            warned += bool(diag["warnings"])
+            if errors_only and diag["ok"] and not diag["warnings"]:
+                continue
+            yield json.dumps(diag) + "\n"
+        yield json.dumps({"summary": {"rows": total, "ok": ok, "invalid": total - ok, "warnings": warned}}) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
 # ---------- API: Orchestrate (sets status) ----------
 @app.post("/api/run/{employee_id}")
-async def run_onboarding(employee_id: int, db=Depends(get_db)):
-    e = db.get(Employee, employee_id)
-    if not e:
-        raise HTTPException(status_code=404, detail="Employee not found")
+async def run_onboarding(
+    employee_id: int,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
+    tenant: Optional[str] = Header(None, alias=admission.TENANT_HEADER),
+    db=Depends(get_db),
+):
+    path = request.url.path
+    if idempotency_key:
+        try:
+            rec = idempotency.lookup(db, idempotency_key, path)
+        except idempotency.KeyReused as ex:
+            raise HTTPException(status_code=422, detail=str(ex))
+        if rec:
+            return JSONResponse(rec.response, status_code=rec.status_code, headers={idempotency.REPLAY_HEADER: "true"})
+
+    # hand the connection back to the pool while queued / running
+    db.close()
+
+    # concurrent calls for the same employee share one pipeline run (see runner.py);
+    # joining an in-flight run costs no extra capacity, so only new runs are admitted
     try:
-        # โชว์สถานะ RUNNING ทันที
-        e.status = "RUNNING"
-        db.commit()
-
-        # ---------- เรียก orchestrator แบบป้องกันทุกกรณี ----------
-        res = None
-
-        # ถ้ามีเมธอด .run ให้ใช้ .run(...)
-        target = getattr(orchestrator, "run", None)
-        if callable(target):
-            maybe = target(employee_id)
-        # ถ้า orchestrator ตัวมันเอง callable (เป็นฟังก์ชัน/คอร์รุตีน)
-        elif callable(orchestrator):
-            maybe = orchestrator(employee_id)
+        if runner.is_inflight(employee_id):
+            res = await runner.run_employee(employee_id)
         else:
-            raise TypeError("Invalid orchestrator: has neither .run(...) nor is callable")
+            async with admission.limiter.slot(tenant):
+                res = await runner.run_employee(employee_id)
+    except admission.Rejected as ex:
+        raise HTTPException(status_code=429, detail=str(ex), headers={"Retry-After": str(ex.retry_after)})
+    except runner.EmployeeNotFound as ex:
+        raise HTTPException(status_code=404, detail=str(ex))
+    except runner.RunInProgress as ex:
+        raise HTTPException(status_code=409, detail=str(ex))
+    except Exception as ex:
+        raise HTTPException(status_code=500, detail=str(ex))
 
-        # รองรับทั้ง sync/async
-        res = await maybe if asyncio.iscoroutine(maybe) else maybe
-        # -----------------------------------------------------------
+    body = {"ok": True, "result": res}
+    if idempotency_key:
+        idempotency.store(db, idempotency_key, path, 200, body)
+    return body
+
+# ---------- API: Stats ----------
+@app.get("/api/stats")
+def get_stats(weeks: int = 8, db=Depends(get_read_db)):
+    """Dashboard counts served from employee_counters (size independent of employees)."""
+    return stats.summary(db, weeks_ahead=max(0, min(weeks, 52)))
+
+
+# ---------- API: Audit export ----------
+@app.get("/api/export")
+def export_audit(
+    format: str = "csv",
+    start_from: Optional[str] = None,
+    start_to: Optional[str] = None,
+    department: Optional[str] = None,
+    gzip: bool = False,
+):
+    """Stream employees + accounts (no passwords) + events + latest agent status."""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    try:
+        sf = _parse_date(start_from) if start_from else None
+        st = _parse_date(start_to) if start_to else None
+    except Exception as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
 
-        # สำเร็จ
-        e = db.get(Employee, employee_id)
-        if e:
-            e.status = "COMPLETED"
-            db.commit()
-        return {"ok": True, "result": res}
+    records = export.iter_records(start_from=sf, start_to=st, department=department or None)
+    body = export.as_csv(records) if format == "csv" else export.as_ndjson(records)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"onboarding_export.{format}"
+    if gzip:
+        body, media_type, filename = export.gzipped(body), "application/gzip", filename + ".gz"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ---------- API: Admin / profiling ----------
+@app.get("/api/admin/profiling")
+def get_profiling():
+    """Sampling/slow-query settings in effect on this worker (stored overrides over env defaults)."""
+    return vars(profiling.config)
+
+
+@app.put("/api/admin/profiling")
+def set_profiling(body: ProfilingSettings):
+    """Change settings for every worker (stored; others pick them up within PROFILE_SETTINGS_REFRESH_SECONDS)."""
+    profiling.store_settings(body.model_dump(exclude_none=True))
+    return vars(profiling.config)
+
+
+@app.get("/api/admin/admission")
+def get_admission():
+    """Run admission of this worker: limits, in-flight, queue depth, wait times; plus deployment-wide leases."""
+    return {**admission.limiter.snapshot(), "shared_leases": admission.shared_usage()}
+
+
+@app.get("/api/admin/profiles")
+def list_profiles(employee_id: Optional[int] = None, limit: int = 50, db=Depends(get_read_db)):
+    q = db.query(RunProfile)
+    if employee_id is not None:
+        q = q.filter(RunProfile.employee_id == employee_id)
+    rows = q.order_by(RunProfile.id.desc()).limit(max(1, min(limit, 500))).all()
+    return [
+        {
+            "id": p.id,
+            "employee_id": p.employee_id,
+            "trace_ids": p.trace_ids,
+            "duration_ms": p.duration_ms,
+            "samples": p.samples,
+            "slow_queries": p.slow_queries,
+            "created_at": p.created_at.isoformat() if p.created_at else None,
+        }
+        for p in rows
+    ]
+
+
+@app.get("/api/admin/profiles/{profile_id}/folded")
+def get_profile_folded(profile_id: int, db=Depends(get_read_db)):
+    """Folded stacks for flamegraph.pl / speedscope / inferno."""
+    p = db.get(RunProfile, profile_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(p.folded or "")
 
-    except Exception as ex:
-        # ล้มเหลว
-        db.rollback()
-        e = db.get(Employee, employee_id)
-        if e:
-            e.status = "FAILED"
-            db.commit()
-        raise HTTPException(status_code=500, detail=str(ex))
 
 # ---------- API: Logs ----------
 @app.get("/api/logs/{employee_id}")
-def get_logs(employee_id: int, db=Depends(get_db)):
+def get_logs(employee_id: int, db=Depends(get_read_db)):
     logs = (
         db.query(AgentLog)
         .filter(AgentLog.employee_id == employee_id)
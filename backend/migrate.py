@@ -0,0 +1,212 @@
+"""
+Versioned schema migrations.
+
+Run once per deploy, before API workers start (they never issue DDL themselves):
+    python migrate.py           # upgrade to the latest version
+    python migrate.py --status  # print current and latest version
+
+Each migration runs in its own transaction and is recorded in `schema_version`.
+Migrations marked transactional=False run in autocommit mode, which Postgres
+needs for CREATE INDEX CONCURRENTLY (index builds without blocking writes).
+
+Migrations never call application code (stats.py, search.py, ...): data and
+SQL they need are frozen here as of the schema version they run against.
+"""
+import sys
+from collections import Counter
+from datetime import timedelta
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Date, column, func, inspect, select, table, text
+from sqlalchemy.engine import Connection, Engine
+
+from db import get_engine, Base, Employee, Account, CalendarEvent, Notification, AgentLog, EmployeeCounter, IdempotencyKey, RunProfile, LlmArtefact, AdmissionLease, ProfilingSetting
+
+# arbitrary constant; serializes concurrent `migrate` runs on Postgres
+MIGRATION_LOCK_KEY = 72_610_001
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+    transactional: bool = True
+
+
+def _m001_initial(conn: Connection) -> None:
+    # checkfirst: databases created by the old create_all() at import are adopted as-is
+    tables = [t.__table__ for t in (Employee, Account, CalendarEvent, Notification, AgentLog)]
+    Base.metadata.create_all(conn, tables=tables, checkfirst=True)
+
+
+def _m002_employee_counters(conn: Connection) -> None:
+    Base.metadata.create_all(conn, tables=[EmployeeCounter.__table__], checkfirst=True)
+    # backfill as of version 1 (no archived_at yet): one bucket per (status, department, Monday)
+    employees = table("employees", column("status"), column("department"), column("start_date", Date))
+    rows = conn.execute(
+        select(employees.c.status, employees.c.department, employees.c.start_date, func.count())
+        .group_by(employees.c.status, employees.c.department, employees.c.start_date)
+    ).all()
+    buckets: Counter = Counter()
+    for status, department, start_date, n in rows:
+        week = start_date - timedelta(days=start_date.weekday())
+        buckets[(status or "PENDING", department or "-", week)] += n
+    conn.execute(text("DELETE FROM employee_counters"))
+    if buckets:
+        conn.execute(
+            text("INSERT INTO employee_counters (status, department, start_week, n) VALUES (:s, :d, :w, :n)"),
+            [{"s": s, "d": d, "w": w, "n": n} for (s, d, w), n in buckets.items()],
+        )
+
+
+def _m003_idempotency_keys(conn: Connection) -> None:
+    Base.metadata.create_all(conn, tables=[IdempotencyKey.__table__], checkfirst=True)
+
+
+def _m004_employee_archived_at(conn: Connection) -> None:
+    cols = {c["name"] for c in inspect(conn).get_columns("employees")}
+    if "archived_at" not in cols:
+        ts = "TIMESTAMP WITH TIME ZONE" if _is_postgres(conn) else "TIMESTAMP"
+        conn.execute(text(f"ALTER TABLE employees ADD COLUMN archived_at {ts}"))
+
+
+def _m005_active_employee_indexes(conn: Connection) -> None:
+    # partial indexes: archived rows drop out of the hot dashboard/import paths
+    concurrently = "CONCURRENTLY " if _is_postgres(conn) else ""
+    conn.execute(text(
+        f"CREATE INDEX {concurrently}IF NOT EXISTS ix_employees_active_id "
+        "ON employees (id) WHERE archived_at IS NULL"
+    ))
+    conn.execute(text(
+        f"CREATE INDEX {concurrently}IF NOT EXISTS ix_employees_active_email_start "
+        "ON employees (email, start_date) WHERE archived_at IS NULL"
+    ))
+
+
+def _m006_status_start_index(conn: Connection) -> None:
+    # autorun polls PENDING employees by start_date: an index range scan instead of a seq scan
+    concurrently = "CONCURRENTLY " if _is_postgres(conn) else ""
+    conn.execute(text(
+        f"CREATE INDEX {concurrently}IF NOT EXISTS ix_employees_active_status_start "
+        "ON employees (status, start_date) WHERE archived_at IS NULL"
+    ))
+
+
+def _m007_run_profiles(conn: Connection) -> None:
+    Base.metadata.create_all(conn, tables=[RunProfile.__table__], checkfirst=True)
+
+
+def _m008_llm_artefacts(conn: Connection) -> None:
+    Base.metadata.create_all(conn, tables=[LlmArtefact.__table__], checkfirst=True)
+
+
+SEARCH_DOC_SQL_V9 = "lower(name || ' ' || email || ' ' || role || ' ' || coalesce(department, ''))"
+
+
+def _m009_search_trgm_index(conn: Connection) -> None:
+    if not _is_postgres(conn):
+        return  # other dialects use the in-memory index in search.py
+    # search.SEARCH_DOC_SQL must stay identical to this expression for the index to be used
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_employees_search_trgm "
+        f"ON employees USING gin (({SEARCH_DOC_SQL_V9}) gin_trgm_ops) WHERE archived_at IS NULL"
+    ))
+
+
+def _m010_admission_leases(conn: Connection) -> None:
+    Base.metadata.create_all(conn, tables=[AdmissionLease.__table__], checkfirst=True)
+
+
+def _m011_name_prefix_index(conn: Connection) -> None:
+    if not _is_postgres(conn):
+        return
+    # C collation: usable for both `LIKE 'q%'` and the ORDER BY of short searches
+    conn.execute(text(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_employees_name_prefix "
+        "ON employees ((lower(name) COLLATE \"C\"), id) WHERE archived_at IS NULL"
+    ))
+
+
+def _m012_profiling_settings(conn: Connection) -> None:
+    Base.metadata.create_all(conn, tables=[ProfilingSetting.__table__], checkfirst=True)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial schema", _m001_initial),
+    Migration(2, "employee_counters summary table", _m002_employee_counters),
+    Migration(3, "idempotency_keys", _m003_idempotency_keys),
+    Migration(4, "employees.archived_at", _m004_employee_archived_at),
+    Migration(5, "partial indexes on active employees", _m005_active_employee_indexes, transactional=False),
+    Migration(6, "(status, start_date) index for autorun", _m006_status_start_index, transactional=False),
+    Migration(7, "run_profiles", _m007_run_profiles),
+    Migration(8, "llm_artefacts", _m008_llm_artefacts),
+    Migration(9, "pg_trgm search index", _m009_search_trgm_index, transactional=False),
+    Migration(10, "admission_leases", _m010_admission_leases),
+    Migration(11, "lower(name) prefix index for short searches", _m011_name_prefix_index, transactional=False),
+    Migration(12, "profiling_settings", _m012_profiling_settings),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _is_postgres(conn: Connection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version INTEGER PRIMARY KEY,"
+        " description VARCHAR NOT NULL,"
+        " applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+
+
+def current_version(conn: Connection) -> int:
+    """Highest applied version, 0 when the schema has never been migrated."""
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar_one()
+
+
+def upgrade(engine: Engine = None) -> int:
+    """Apply pending migrations in order and return the resulting version."""
+    engine = engine or get_engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        if _is_postgres(lock_conn):
+            lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": MIGRATION_LOCK_KEY})
+        try:
+            with engine.begin() as conn:
+                _ensure_version_table(conn)
+                version = current_version(conn)
+            for m in MIGRATIONS:
+                if m.version <= version:
+                    continue
+                if m.transactional:
+                    with engine.begin() as conn:
+                        m.apply(conn)
+                        _stamp(conn, m)
+                else:
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        m.apply(conn)
+                        _stamp(conn, m)
+                version = m.version
+            return version
+        finally:
+            if _is_postgres(lock_conn):
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MIGRATION_LOCK_KEY})
+
+
+def _stamp(conn: Connection, m: Migration) -> None:
+    conn.execute(
+        text("INSERT INTO schema_version (version, description) VALUES (:v, :d)"),
+        {"v": m.version, "d": m.description},
+    )
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv[1:]:
+        with get_engine().connect() as c:
+            print(f"current={current_version(c)} latest={LATEST_VERSION}")
+    else:
+        print(f"schema at version {upgrade()}")
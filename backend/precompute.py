@@ -0,0 +1,175 @@
+"""
+Speculative precomputation of LLM artefacts.
+
+create_employee / upload_csv enqueue new employees; a few low-priority
+background workers (PRECOMPUTE_CONCURRENCY) generate the LLM normalization
+and orientation proposal and store them in `llm_artefacts`, keyed by a
+fingerprint of the exact LLM inputs (plus model and prompt version).
+During a run, agents call get_or_compute(): a stored artefact whose
+fingerprint still matches is used as-is, otherwise it is regenerated inline.
+
+The welcome email is not precomputed: NotifierAgent composes it from a fixed
+template and never calls llm_welcome_email.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from db import SessionLocal, Employee, LlmArtefact, insert_for
+from settings import (
+    DEFAULT_TZ,
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    PRECOMPUTE_CONCURRENCY,
+    PRECOMPUTE_QUEUE_MAX,
+)
+
+logger = logging.getLogger("krnl.precompute")
+
+# bump when a prompt changes so stored artefacts stop matching
+PROMPT_VERSION = 1
+
+NORMALIZE = "normalize"
+ORIENTATION = "orientation"
+
+_queue: Optional[asyncio.PriorityQueue] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def normalize_inputs(emp: Employee) -> Dict[str, Any]:
+    """Exactly what ValidatorAgent sends to llm_normalize_employee."""
+    return {
+        "name": emp.name,
+        "email": emp.email,
+        "role": emp.role,
+        "department": emp.department,
+        "start_date": str(emp.start_date),
+    }
+
+
+def orientation_inputs(emp: Employee) -> Dict[str, Any]:
+    """Exactly what SchedulerAgent sends to llm_propose_orientation_event."""
+    return {
+        "name": emp.name,
+        "email": emp.email,
+        "start_date": str(emp.start_date),
+        "role": emp.role,
+        "tz": DEFAULT_TZ or "Asia/Bangkok",
+    }
+
+
+def _have_llm() -> bool:
+    # imported lazily: keeps the LLM client out of API worker startup
+    from agents import llm_utils
+    return llm_utils.have_llm()
+
+
+async def _generate(kind: str, inputs: Dict[str, Any]) -> Any:
+    from agents import llm_utils
+    if kind == NORMALIZE:
+        return await llm_utils.llm_normalize_employee(inputs)
+    if kind == ORIENTATION:
+        return await llm_utils.llm_propose_orientation_event(**inputs)
+    raise ValueError(f"Unknown artefact kind: {kind}")
+
+
+def fingerprint(kind: str, inputs: Dict[str, Any]) -> str:
+    raw = json.dumps([kind, PROMPT_VERSION, LLM_MODEL, LLM_TEMPERATURE, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _load(employee_id: int, kind: str, fp: str) -> Optional[Any]:
+    db = SessionLocal()
+    try:
+        row = db.get(LlmArtefact, (employee_id, kind))
+        return row.payload if row is not None and row.fingerprint == fp else None
+    finally:
+        db.close()
+
+
+def _save(employee_id: int, kind: str, fp: str, payload: Any) -> None:
+    db = SessionLocal()
+    try:
+        insert = insert_for(db)
+        stmt = insert(LlmArtefact).values(employee_id=employee_id, kind=kind, fingerprint=fp, payload=payload)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["employee_id", "kind"],
+            set_={"fingerprint": stmt.excluded.fingerprint, "payload": stmt.excluded.payload},
+        )
+        db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def get_or_compute(employee_id: int, kind: str, inputs: Dict[str, Any]) -> Tuple[Any, bool]:
+    """Return (payload, precomputed). Without an LLM key the fallback is returned directly."""
+    if not _have_llm():
+        return await _generate(kind, inputs), False
+    fp = fingerprint(kind, inputs)
+    cached = _load(employee_id, kind, fp)
+    if cached is not None:
+        return cached, True
+    payload = await _generate(kind, inputs)
+    _save(employee_id, kind, fp, payload)
+    return payload, False
+
+
+async def _precompute_employee(employee_id: int) -> None:
+    db = SessionLocal()
+    try:
+        emp = db.get(Employee, employee_id)
+        if emp is None or emp.status != "PENDING":
+            return
+        jobs = [(NORMALIZE, normalize_inputs(emp)), (ORIENTATION, orientation_inputs(emp))]
+    finally:
+        db.close()
+    for kind, inputs in jobs:
+        fp = fingerprint(kind, inputs)
+        if _load(employee_id, kind, fp) is None:
+            _save(employee_id, kind, fp, await _generate(kind, inputs))
+
+
+def enqueue(employees: Iterable[Tuple[int, date]]) -> int:
+    """
+    Queue (employee_id, start_date) pairs, soonest start first. Thread-safe, never blocks;
+    drops work when the queue is full or workers are not running (agents then compute inline).
+    """
+    if _queue is None or _loop is None or not _have_llm():
+        return 0
+    items = list(employees)
+
+    def _put() -> None:
+        for eid, start_date in items:
+            try:
+                _queue.put_nowait((start_date.toordinal(), eid))
+            except asyncio.QueueFull:
+                logger.info("precompute queue full; employee %s will be computed at run time", eid)
+
+    _loop.call_soon_threadsafe(_put)
+    return len(items)
+
+
+async def worker_loop(concurrency: int = PRECOMPUTE_CONCURRENCY) -> None:
+    """Lifespan task: drain the queue with a bounded number of concurrent LLM calls."""
+    global _queue, _loop
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.PriorityQueue(maxsize=PRECOMPUTE_QUEUE_MAX)
+
+    async def _worker() -> None:
+        while True:
+            _, eid = await _queue.get()
+            try:
+                await _precompute_employee(eid)
+            except Exception:
+                logger.exception("precompute failed for employee %s", eid)
+            finally:
+                _queue.task_done()
+
+    try:
+        await asyncio.gather(*(_worker() for _ in range(max(1, concurrency))))
+    finally:
+        _queue = _loop = None
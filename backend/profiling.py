@@ -0,0 +1,223 @@
+"""
+On-demand profiling of pipeline runs and slow-query capture.
+
+- A configurable fraction of runs is sampled by a stack sampler thread that
+  reads the event-loop thread's frames every PROFILE_INTERVAL_MS. Stacks are
+  stored per run in `run_profiles` in folded format ("a;b;c <count>"), which
+  flamegraph.pl, speedscope and inferno read directly. Because the pipeline is
+  async, samples show whatever was on the loop thread during the run.
+- SQLAlchemy cursor hooks time every statement; those over SLOW_QUERY_MS are
+  logged with their parameter shape (types, never values) and the first
+  call site in this codebase, tagged with the employee being run. Slow queries
+  of a sampled run are stored with its profile next to the AgentLog trace IDs.
+
+Settings default to the environment. PUT /api/admin/profiling stores overrides
+in `profiling_settings`; every worker re-reads them every
+PROFILE_SETTINGS_REFRESH_SECONDS, so one call reaches the whole deployment.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from settings import PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, SLOW_QUERY_MS
+
+logger = logging.getLogger("krnl.profiling")
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+_MAX_STATEMENT = 500
+_MAX_SLOW_PER_RUN = 200
+
+
+@dataclass
+class ProfilingConfig:
+    sample_rate: float = PROFILE_SAMPLE_RATE
+    interval_ms: float = PROFILE_INTERVAL_MS
+    slow_query_ms: float = SLOW_QUERY_MS  # <= 0 disables slow-query capture
+
+
+config = ProfilingConfig()
+_DEFAULTS = ProfilingConfig()
+
+
+# ---------- deployment-wide settings ----------
+def _apply(row: Any) -> None:
+    for f in fields(ProfilingConfig):
+        stored = getattr(row, f.name, None) if row is not None else None
+        setattr(config, f.name, getattr(_DEFAULTS, f.name) if stored is None else stored)
+
+
+def load_settings() -> None:
+    """Apply the stored overrides (if any) to this worker's config."""
+    from db import SessionLocal, ProfilingSetting
+    db = SessionLocal()
+    try:
+        _apply(db.get(ProfilingSetting, 1))
+    finally:
+        db.close()
+
+
+def store_settings(changes: Dict[str, Any]) -> None:
+    """Persist overrides for all workers and apply them here right away."""
+    from db import SessionLocal, ProfilingSetting, insert_for
+    db = SessionLocal()
+    try:
+        if changes:
+            stmt = insert_for(db)(ProfilingSetting).values(id=1, **changes)
+            db.execute(stmt.on_conflict_do_update(index_elements=["id"], set_=changes))
+            db.commit()
+        _apply(db.get(ProfilingSetting, 1))
+    finally:
+        db.close()
+
+
+async def settings_loop(interval: float) -> None:
+    """Lifespan task: pick up settings changed through any worker."""
+    while True:
+        try:
+            await asyncio.to_thread(load_settings)
+        except Exception:
+            logger.exception("could not load profiling settings")
+        await asyncio.sleep(interval)
+
+
+@dataclass
+class RunContext:
+    employee_id: int
+    slow_queries: List[Dict[str, Any]] = field(default_factory=list)
+
+
+current_run: contextvars.ContextVar[Optional[RunContext]] = contextvars.ContextVar("current_run", default=None)
+
+
+# ---------- stack sampler ----------
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval_ms: float):
+        self.thread_id = thread_id
+        self.interval = max(interval_ms, 1.0) / 1000.0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="krnl-profiler", daemon=True)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common())
+
+
+def should_sample() -> bool:
+    return config.sample_rate > 0 and random.random() < config.sample_rate
+
+
+def start_sampler() -> StackSampler:
+    return StackSampler(threading.get_ident(), config.interval_ms).start()
+
+
+def save_profile(employee_id: int, trace_ids: Any, duration_ms: float, sampler: StackSampler, ctx: RunContext) -> int:
+    from db import SessionLocal, RunProfile
+    db = SessionLocal()
+    try:
+        prof = RunProfile(
+            employee_id=employee_id,
+            trace_ids=trace_ids if isinstance(trace_ids, list) else None,
+            duration_ms=round(duration_ms, 1),
+            samples=sum(sampler.stacks.values()),
+            folded=sampler.folded(),
+            slow_queries=ctx.slow_queries,
+        )
+        db.add(prof)
+        db.commit()
+        db.refresh(prof)
+        return prof.id
+    finally:
+        db.close()
+
+
+# ---------- slow-query hooks ----------
+def _param_shape(params: Any) -> Any:
+    if isinstance(params, dict):
+        return {k: type(v).__name__ for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        if params and isinstance(params[0], (dict, list, tuple)):
+            return {"executemany": len(params), "row": _param_shape(params[0])}
+        return [type(v).__name__ for v in params]
+    return type(params).__name__
+
+
+def _call_site() -> Optional[str]:
+    """Innermost frame that belongs to this codebase (not SQLAlchemy, not this module)."""
+    for fs in reversed(traceback.extract_stack()):
+        if fs.filename.startswith(_BACKEND_DIR) and not fs.filename.endswith(("profiling.py", "db.py")):
+            return f"{os.path.relpath(fs.filename, _BACKEND_DIR)}:{fs.lineno} in {fs.name}"
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("krnl_query_t0", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("krnl_query_t0")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    if config.slow_query_ms <= 0 or elapsed_ms < config.slow_query_ms:
+        return
+    ctx = current_run.get()
+    record = {
+        "ms": round(elapsed_ms, 1),
+        "statement": " ".join(statement.split())[:_MAX_STATEMENT],
+        "params": _param_shape(parameters),
+        "call_site": _call_site(),
+        "employee_id": ctx.employee_id if ctx else None,
+    }
+    logger.warning("slow query %.1f ms at %s (employee %s): %s",
+                   record["ms"], record["call_site"], record["employee_id"], record["statement"])
+    if ctx is not None and len(ctx.slow_queries) < _MAX_SLOW_PER_RUN:
+        ctx.slow_queries.append(record)
+
+
+def _handle_error(exception_context):
+    # keep start times paired with statements when a statement fails
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("krnl_query_t0"):
+        conn.info["krnl_query_t0"].pop()
+
+
+def install_query_hooks(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
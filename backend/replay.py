@@ -0,0 +1,361 @@
+"""
+Replay historical pipeline runs from stored AgentLog rows.
+
+Runs are rebuilt from a source database (default: the configured DB, replica
+if any; read-only): every Validator log starts a run, and its `input` holds the
+employee fields used. Each employee is recreated in a scratch target database
+and its runs are replayed in order through the current orchestrator, so later
+runs see the state earlier runs left behind, as in production.
+
+LLM calls are answered from the original run's recordings (Validator
+`output.llm`, Scheduler "AI-proposed event"), never the network: the scheduler
+runs in-process and notifications are simulated. `--llm-delay-ms` adds a fixed
+delay per stubbed LLM call to approximate production latency.
+
+Reported per agent: replay wall time (Account includes its nested Scheduler
+call) and output/step diffs against the original logs, ignoring volatile
+fields (ids, generated usernames, transport). Per run, the span from the
+Validator log to the Notifier log is compared with the original timestamps.
+
+    python replay.py --target sqlite:////tmp/replay.db [--employee 12 ...] [--limit 50]
+"""
+import argparse
+import asyncio
+import copy
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import date
+from typing import Any, Dict, List, Optional, Union
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import db
+from db import AgentLog, Employee
+from settings import DATABASE_READ_URL, DATABASE_URL
+
+AGENTS = ("Validator", "Scheduler", "Account", "Notifier")
+VOLATILE_KEYS = {"log_id", "scheduler_log_id", "calendar_event_id", "username", "transport", "precomputed", "simulate", "channel"}
+LLM_FALLBACK = {"corrections": [], "warnings": ["LLM not configured; used rule-based fallback."]}
+
+
+# ---------- loading recorded runs ----------
+def load_runs(source: Union[str, Engine], employee_ids: Optional[List[int]] = None, limit: int = 50) -> Dict[int, List[Dict[str, AgentLog]]]:
+    """employee_id -> runs in order; each run maps agent name -> its AgentLog. `source` is a URL or an open Engine."""
+    engine = source if isinstance(source, Engine) else create_engine(source, future=True)
+    try:
+        with Session(engine) as s:
+            if not employee_ids:
+                employee_ids = list(s.scalars(
+                    select(AgentLog.employee_id).where(AgentLog.agent == "Validator")
+                    .group_by(AgentLog.employee_id).order_by(AgentLog.employee_id.desc()).limit(limit)
+                ))
+            logs = s.scalars(
+                select(AgentLog).where(AgentLog.employee_id.in_(employee_ids)).order_by(AgentLog.id)
+            ).all()
+            s.expunge_all()
+    finally:
+        if engine is not source:
+            engine.dispose()
+    runs: Dict[int, List[Dict[str, AgentLog]]] = defaultdict(list)
+    for log in logs:
+        if log.agent == "Validator":
+            runs[log.employee_id].append({})
+        if runs[log.employee_id] and log.agent not in runs[log.employee_id][-1]:
+            runs[log.employee_id][-1][log.agent] = log
+    return dict(sorted(runs.items()))
+
+
+class RecordedLLM:
+    """Serves one run's recorded LLM responses in place of agents.llm_utils._chat_json."""
+
+    def __init__(self, run: Dict[str, AgentLog], delay_ms: float = 0):
+        v = run.get("Validator")
+        self.normalize = (v.output or {}).get("llm") if v is not None else None
+        self.enabled = self.normalize is not None and self.normalize != LLM_FALLBACK
+        self.orientation = None
+        sched = run.get("Scheduler")
+        if sched is not None and any(st.get("description") == "AI-proposed event" for st in sched.steps or []):
+            ev = (sched.output or {}).get("event") or {}
+            self.orientation = {k: ev.get(k) for k in ("start", "end", "location", "description")}
+        self.delay = delay_ms / 1000
+        self.calls = 0
+
+    def have_llm(self) -> bool:
+        return self.enabled
+
+    async def chat_json(self, prompt: str) -> Dict[str, Any]:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        recorded = self.orientation if "orientation" in prompt else self.normalize
+        return copy.deepcopy(recorded) if recorded is not None else {"_notes": "no recorded response"}
+
+
+# ---------- diffing ----------
+def _clean(v: Any) -> Any:
+    if isinstance(v, dict):
+        return {k: _clean(x) for k, x in v.items() if k not in VOLATILE_KEYS}
+    if isinstance(v, list):
+        return [_clean(x) for x in v]
+    return v
+
+
+def _comparable(log: AgentLog) -> Dict[str, Any]:
+    steps = [
+        {"description": (st.get("description") or "").replace(" (precomputed)", ""), "data": _clean(st.get("data"))}
+        for st in log.steps or []
+    ]
+    return {"status": log.status, "output": _clean(log.output), "steps": steps}
+
+
+def diff(a: Any, b: Any, path: str = "") -> List[str]:
+    """Human-readable differences between two JSON values."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        out: List[str] = []
+        for k in sorted(set(a) | set(b), key=str):
+            p = f"{path}.{k}" if path else str(k)
+            if k not in a:
+                out.append(f"{p}: added {b[k]!r}")
+            elif k not in b:
+                out.append(f"{p}: removed {a[k]!r}")
+            else:
+                out.extend(diff(a[k], b[k], p))
+        return out
+    if isinstance(a, list) and isinstance(b, list):
+        out = []
+        for i in range(max(len(a), len(b))):
+            p = f"{path}[{i}]"
+            if i >= len(a):
+                out.append(f"{p}: added {b[i]!r}")
+            elif i >= len(b):
+                out.append(f"{p}: removed {a[i]!r}")
+            else:
+                out.extend(diff(a[i], b[i], p))
+        return out
+    return [] if a == b else [f"{path}: {a!r} -> {b!r}"]
+
+
+# ---------- replay ----------
+def _reset_employee(employee_id: int, fields: Dict[str, Any]) -> None:
+    """Recreate the employee (same id) in the target without any child rows."""
+    import bulk
+    import stats
+    s = db.SessionLocal()
+    try:
+        bulk.delete_employees(s, [employee_id])
+        emp = Employee(id=employee_id, status="PENDING", **fields)
+        s.add(emp)
+        stats.on_insert(s, emp)
+        s.commit()
+    finally:
+        s.close()
+
+
+def _update_employee(employee_id: int, fields: Dict[str, Any]) -> None:
+    s = db.SessionLocal()
+    try:
+        emp = s.get(Employee, employee_id)
+        for k, v in fields.items():
+            setattr(emp, k, v)
+        s.commit()
+    finally:
+        s.close()
+
+
+def _employee_fields(validator_input: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": validator_input["name"],
+        "email": validator_input["email"],
+        "role": validator_input["role"],
+        "department": validator_input.get("department"),
+        "start_date": date.fromisoformat(str(validator_input["start_date"])[:10]),
+    }
+
+
+def _new_logs(employee_id: int, since_id: int) -> Dict[str, AgentLog]:
+    s = db.SessionLocal()
+    try:
+        out: Dict[str, AgentLog] = {}
+        for log in s.scalars(
+            select(AgentLog).where(AgentLog.employee_id == employee_id, AgentLog.id > since_id).order_by(AgentLog.id)
+        ):
+            out.setdefault(log.agent, log)
+        s.expunge_all()
+        return out
+    finally:
+        s.close()
+
+
+def _last_log_id() -> int:
+    s = db.SessionLocal()
+    try:
+        return s.scalar(select(AgentLog.id).order_by(AgentLog.id.desc()).limit(1)) or 0
+    finally:
+        s.close()
+
+
+def _span_ms(run: Dict[str, AgentLog]) -> Optional[float]:
+    v, n = run.get("Validator"), run.get("Notifier")
+    if v is None or n is None or v.created_at is None or n.created_at is None:
+        return None
+    return (n.created_at - v.created_at).total_seconds() * 1000
+
+
+async def replay(runs: Dict[int, List[Dict[str, AgentLog]]], llm_delay_ms: float = 0) -> Dict[str, Any]:
+    """Replay runs against the current target DB (see db.use_database)."""
+    from agents import llm_utils, notifier_agent, scheduler_agent
+    from agents.account_agent import AccountAgent
+    from agents.notifier_agent import NotifierAgent
+    from agents.scheduler_agent import SchedulerAgent
+    from agents.validator_agent import ValidatorAgent
+    from orchestrator import orchestrator
+    import scheduler_service
+
+    timings: Dict[str, float] = {}
+    ends: Dict[str, float] = {}
+
+    def _timed(cls, name):
+        original = cls.run
+
+        async def run(self, employee_id):
+            t0 = time.perf_counter()
+            try:
+                return await original(self, employee_id)
+            finally:
+                ends[name] = time.perf_counter()
+                timings[name] = (ends[name] - t0) * 1000
+        return run
+
+    results: List[Dict[str, Any]] = []
+    with ExitStack() as stack:
+        for cls, name in ((ValidatorAgent, "Validator"), (AccountAgent, "Account"),
+                          (SchedulerAgent, "Scheduler"), (NotifierAgent, "Notifier")):
+            stack.enter_context(mock.patch.object(cls, "run", _timed(cls, name)))
+        # offline: no scheduler RPC, no SMTP
+        stack.enter_context(mock.patch.object(scheduler_service, "SCHEDULER_RPC_URL", None))
+        stack.enter_context(mock.patch.object(notifier_agent, "SIMULATE_INTEGRATIONS", True))
+        stack.enter_context(mock.patch.object(scheduler_agent, "SIMULATE_INTEGRATIONS", True))
+
+        for employee_id, emp_runs in runs.items():
+            for n, run in enumerate(emp_runs):
+                fields = _employee_fields(run["Validator"].input or {})
+                if n == 0:
+                    _reset_employee(employee_id, fields)
+                else:
+                    _update_employee(employee_id, fields)
+                llm = RecordedLLM(run, llm_delay_ms)
+                timings.clear()
+                ends.clear()
+                mark = _last_log_id()
+                error = None
+                with mock.patch.object(llm_utils, "_chat_json", llm.chat_json), \
+                        mock.patch.object(llm_utils, "have_llm", llm.have_llm), \
+                        mock.patch.object(scheduler_agent, "have_llm", llm.have_llm):
+                    try:
+                        await orchestrator.run(employee_id)
+                    except Exception as ex:
+                        error = f"{type(ex).__name__}: {ex}"
+                replayed = _new_logs(employee_id, mark)
+                agents = {}
+                for name in AGENTS:
+                    orig, new = run.get(name), replayed.get(name)
+                    if orig is None and new is None:
+                        continue
+                    if orig is None or new is None:
+                        d = [f"{name}: {'missing in replay' if new is None else 'not in original run'}"]
+                    else:
+                        d = diff(_comparable(orig), _comparable(new))
+                    agents[name] = {"replay_ms": round(timings.get(name, 0.0), 1), "diffs": d}
+                span = None
+                if "Validator" in ends and "Notifier" in ends:
+                    span = (ends["Notifier"] - ends["Validator"]) * 1000
+                orig_span = _span_ms(run)
+                results.append({
+                    "employee_id": employee_id,
+                    "run": n + 1,
+                    "original_log_ids": [log.id for log in run.values()],
+                    "llm_calls": llm.calls,
+                    "error": error,
+                    "original_span_ms": round(orig_span, 1) if orig_span is not None else None,
+                    "replay_span_ms": round(span, 1) if span is not None else None,
+                    "agents": agents,
+                })
+    return {"runs": results, "summary": summarize(results)}
+
+
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return round(values[int(q * (len(values) - 1))], 1) if values else 0.0
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    per_agent: Dict[str, Dict[str, Any]] = {}
+    for name in AGENTS:
+        rows = [r["agents"][name] for r in results if name in r["agents"]]
+        lat = [a["replay_ms"] for a in rows]
+        per_agent[name] = {
+            "runs": len(rows),
+            "p50_ms": _pct(lat, 0.5),
+            "p95_ms": _pct(lat, 0.95),
+            "max_ms": round(max(lat), 1) if lat else 0.0,
+            "runs_with_diffs": sum(1 for a in rows if a["diffs"]),
+        }
+    return {
+        "runs": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "runs_with_diffs": sum(1 for r in results if any(a["diffs"] for a in r["agents"].values())),
+        "agents": per_agent,
+    }
+
+
+def _print_report(report: Dict[str, Any], show_diffs: bool) -> None:
+    for r in report["runs"]:
+        ndiff = sum(len(a["diffs"]) for a in r["agents"].values())
+        print(f"employee {r['employee_id']} run {r['run']}: span {r['original_span_ms']} -> {r['replay_span_ms']} ms, "
+              f"{ndiff} diffs{', ' + r['error'] if r['error'] else ''}")
+        if show_diffs:
+            for name, a in r["agents"].items():
+                for d in a["diffs"]:
+                    print(f"    {name}: {d}")
+    s = report["summary"]
+    print(f"\n{s['runs']} runs, {s['errors']} errors, {s['runs_with_diffs']} with diffs")
+    print(f"{'agent':<10} {'runs':>5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'diffs':>6}")
+    for name, a in s["agents"].items():
+        print(f"{name:<10} {a['runs']:>5} {a['p50_ms']:>8} {a['p95_ms']:>8} {a['max_ms']:>8} {a['runs_with_diffs']:>6}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Replay stored AgentLog runs against the current agents.")
+    ap.add_argument("--source", default=DATABASE_READ_URL or DATABASE_URL, help="DB holding the original agent_logs")
+    ap.add_argument("--target", required=True, help="scratch DB the replay writes to (never the source)")
+    ap.add_argument("--employee", type=int, action="append", help="employee id to replay (repeatable)")
+    ap.add_argument("--limit", type=int, default=50, help="most recent employees to replay when --employee is not given")
+    ap.add_argument("--llm-delay-ms", type=float, default=0, help="simulated latency per recorded LLM call")
+    ap.add_argument("--json", dest="json_path", help="write the full report to this file")
+    ap.add_argument("--show-diffs", action="store_true")
+    ap.add_argument("--fail-on-diff", action="store_true", help="exit 1 if any run differs")
+    args = ap.parse_args(argv)
+    if args.target in (args.source, DATABASE_URL):
+        ap.error("--target must be a scratch database, not the source")
+
+    runs = load_runs(args.source, args.employee, args.limit)
+    import migrate
+    migrate.upgrade(db.use_database(args.target))
+    report = asyncio.run(replay(runs, args.llm_delay_ms))
+    _print_report(report, args.show_diffs)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+    if args.fail_on_diff and report["summary"]["runs_with_diffs"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Single-flight execution of the onboarding pipeline.
+
+At most one run per employee is in flight across the whole deployment:
+  - in-process: concurrent callers share one asyncio task (and its result);
+  - across workers: the task holds a Postgres advisory lock keyed by employee_id.
+A caller that had to wait for another worker's lock reuses that run's result
+instead of re-running the agents. It waits at most RUN_LOCK_WAIT_SECONDS and
+borrows a pooled connection only per attempt; lock I/O runs in a worker thread.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, text
+
+from db import SessionLocal, Employee, AgentLog, get_engine
+from settings import RUN_LOCK_WAIT_SECONDS
+import profiling
+import stats
+
+# first key of pg_advisory_lock(int, int); second key is the employee id
+RUN_LOCK_CLASS = 7261
+LOCK_POLL_SECONDS = 0.25
+
+_inflight: Dict[int, "asyncio.Task[Dict[str, Any]]"] = {}
+
+
+class EmployeeNotFound(Exception):
+    """The employee to run does not exist (a KeyError from inside an agent is not this)."""
+
+
+class RunInProgress(Exception):
+    """Another worker kept running this employee for longer than RUN_LOCK_WAIT_SECONDS."""
+
+
+class EmployeeRunLock:
+    """Session-level advisory lock on a dedicated connection (no-op off Postgres)."""
+
+    def __init__(self, employee_id: int, max_wait: float = RUN_LOCK_WAIT_SECONDS):
+        self.employee_id = employee_id
+        self.max_wait = max_wait
+        self.waited = False
+        self._conn = None
+
+    def _try_lock(self) -> bool:
+        # blocking; runs in a worker thread. The connection is kept only while it holds the lock.
+        conn = get_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            got = conn.execute(
+                text("SELECT pg_try_advisory_lock(:c, :k)"),
+                {"c": RUN_LOCK_CLASS, "k": self.employee_id},
+            ).scalar()
+        except BaseException:
+            conn.close()
+            raise
+        if not got:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def _unlock(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                text("SELECT pg_advisory_unlock(:c, :k)"),
+                {"c": RUN_LOCK_CLASS, "k": self.employee_id},
+            )
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    async def acquire(self) -> None:
+        if get_engine().dialect.name != "postgresql":
+            return
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(self._try_lock))
+            try:
+                if await asyncio.shield(attempt):
+                    return
+            except asyncio.CancelledError:
+                # the attempt may still take the lock: give it back once it finishes
+                attempt.add_done_callback(
+                    lambda _: asyncio.get_running_loop().run_in_executor(None, self._unlock)
+                )
+                raise
+            self.waited = True
+            if time.monotonic() >= deadline:
+                raise RunInProgress(f"employee {self.employee_id} is being run by another worker")
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+
+    async def release(self) -> None:
+        if self._conn is not None:
+            await asyncio.to_thread(self._unlock)
+
+
+def _set_status(db, emp: Employee, status: str) -> None:
+    # fresh status/archived_at under a row lock: a concurrent bulk archive/delete waits for us
+    db.refresh(emp, with_for_update=True)
+    stats.on_status_change(db, emp, emp.status, status)
+    emp.status = status
+    db.commit()
+
+
+def _last_log_id(db, employee_id: int) -> int:
+    return db.query(func.coalesce(func.max(AgentLog.id), 0)).filter(AgentLog.employee_id == employee_id).scalar()
+
+
+async def _execute(employee_id: int) -> Any:
+    db = SessionLocal()
+    try:
+        e = db.get(Employee, employee_id)
+        if not e:
+            raise EmployeeNotFound("Employee not found")
+        try:
+            # โชว์สถานะ RUNNING ทันที
+            _set_status(db, e, "RUNNING")
+
+            # ---------- เรียก orchestrator แบบป้องกันทุกกรณี ----------
+            # imported on first run: keeps agents/LLM clients out of worker cold start
+            from orchestrator import orchestrator
+
+            # ถ้ามีเมธอด .run ให้ใช้ .run(...)
+            target = getattr(orchestrator, "run", None)
+            if callable(target):
+                maybe = target(employee_id)
+            # ถ้า orchestrator ตัวมันเอง callable (เป็นฟังก์ชัน/คอร์รุตีน)
+            elif callable(orchestrator):
+                maybe = orchestrator(employee_id)
+            else:
+                raise TypeError("Invalid orchestrator: has neither .run(...) nor is callable")
+
+            # รองรับทั้ง sync/async
+            res = await maybe if asyncio.iscoroutine(maybe) else maybe
+            # -----------------------------------------------------------
+
+            # สำเร็จ
+            e = db.get(Employee, employee_id)
+            if e:
+                _set_status(db, e, "COMPLETED")
+            return res
+
+        except Exception:
+            # ล้มเหลว
+            db.rollback()
+            e = db.get(Employee, employee_id)
+            if e:
+                _set_status(db, e, "FAILED")
+            raise
+    finally:
+        db.close()
+
+
+def _shared_result(employee_id: int, since_log_id: int) -> Optional[List[int]]:
+    """Trace of a run another worker completed while we waited for its lock."""
+    db = SessionLocal()
+    try:
+        e = db.get(Employee, employee_id)
+        if not e or e.status != "COMPLETED":
+            return None
+        ids = [
+            row.id for row in
+            db.query(AgentLog.id)
+            .filter(AgentLog.employee_id == employee_id, AgentLog.id > since_log_id)
+            .order_by(AgentLog.id.asc())
+        ]
+        return ids or None
+    finally:
+        db.close()
+
+
+async def _run_locked(employee_id: int) -> Any:
+    db = SessionLocal()
+    try:
+        mark = _last_log_id(db, employee_id)
+    finally:
+        db.close()
+
+    lock = EmployeeRunLock(employee_id)
+    await lock.acquire()
+    try:
+        if lock.waited:
+            shared = _shared_result(employee_id, mark)
+            if shared is not None:
+                return shared
+        return await _profiled_execute(employee_id)
+    finally:
+        await lock.release()
+
+
+async def _profiled_execute(employee_id: int) -> Any:
+    """_execute() tagged for slow-query capture, stack-sampled for a fraction of runs."""
+    ctx = profiling.RunContext(employee_id)
+    token = profiling.current_run.set(ctx)
+    sampler = profiling.start_sampler() if profiling.should_sample() else None
+    t0 = time.perf_counter()
+    res = None
+    try:
+        res = await _execute(employee_id)
+        return res
+    finally:
+        profiling.current_run.reset(token)
+        if ctx.slow_queries:
+            profiling.logger.warning("employee %s run (trace %s): %d slow queries",
+                                     employee_id, res, len(ctx.slow_queries))
+        if sampler is not None:
+            sampler.stop()
+            try:
+                profiling.save_profile(employee_id, res, (time.perf_counter() - t0) * 1000, sampler, ctx)
+            except Exception:
+                profiling.logger.exception("could not store profile for employee %s", employee_id)
+
+
+def is_inflight(employee_id: int) -> bool:
+    """True if this worker already has a run for the employee that a new caller would join."""
+    return employee_id in _inflight
+
+
+async def run_employee(employee_id: int) -> Any:
+    """
+    Run the pipeline for one employee, joining an in-flight run if there is one.
+    Raises EmployeeNotFound if the employee does not exist.
+    """
+    task = _inflight.get(employee_id)
+    if task is None:
+        task = asyncio.create_task(_run_locked(employee_id))
+        _inflight[employee_id] = task
+
+        def _done(t, eid=employee_id):
+            if _inflight.get(eid) is t:
+                del _inflight[eid]
+
+        task.add_done_callback(_done)
+    # shield: a disconnecting client must not cancel a run other callers share
+    return await asyncio.shield(task)
@@ -0,0 +1,269 @@
+"""
+SchedulerAgent as an out-of-process A2A service (see mcp/scheduler.manifest.json).
+
+Protocol: JSON-RPC 2.0, one JSON message per line over a persistent TCP
+connection. A message may be a single request or a batch (array); requests
+on one connection are processed concurrently and answered as they finish,
+matched by "id".
+
+    python scheduler_service.py            # serve on SCHEDULER_RPC_BIND
+
+Callers use `create_event()`: it goes through the shared SchedulerClient when
+SCHEDULER_RPC_URL is set and falls back to running SchedulerAgent in-process
+when it is not set or no connection can be opened (ServiceUnavailable). Once a
+request has been sent, a missing answer (RpcTimeout) or a dropped connection
+(RpcConnectionLost) fails the call instead: it may still be running remotely,
+and running it again in-process would create a second event.
+"""
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from settings import SCHEDULER_RPC_URL, SCHEDULER_RPC_BIND, SCHEDULER_RPC_TIMEOUT
+
+logger = logging.getLogger("krnl.scheduler_service")
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+Method = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class ServiceUnavailable(Exception):
+    """No connection could be opened: nothing was sent, so running in-process is safe."""
+
+
+class RpcTimeout(Exception):
+    """Request was sent but not answered within the timeout (no fallback)."""
+
+
+class RpcConnectionLost(Exception):
+    """Connection dropped after the request was sent (no fallback)."""
+
+
+# ---------- server ----------
+async def _create_event(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Manifest capability `create_event`; start_date/attendees are derived from the employee row."""
+    employee_id = params.get("employee_id")
+    if not isinstance(employee_id, int):
+        raise RpcError(INVALID_PARAMS, "employee_id (integer) is required")
+    from agents.scheduler_agent import SchedulerAgent
+    return await SchedulerAgent().run(employee_id)
+
+
+METHODS: Dict[str, Method] = {"create_event": _create_event}
+
+
+def _error(id_: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": id_, "error": {"code": code, "message": message}}
+
+
+async def handle_request(req: Any, methods: Dict[str, Method]) -> Optional[Dict[str, Any]]:
+    """Execute one request; returns None for notifications (no "id")."""
+    if not isinstance(req, dict) or req.get("jsonrpc") != "2.0" or not isinstance(req.get("method"), str):
+        return _error(None, INVALID_REQUEST, "Invalid Request")
+    id_ = req.get("id")
+    fn = methods.get(req["method"])
+    try:
+        if fn is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Method not found: {req['method']}")
+        params = req.get("params") or {}
+        if not isinstance(params, dict):
+            raise RpcError(INVALID_PARAMS, "params must be an object")
+        result = await fn(params)
+    except RpcError as ex:
+        resp = _error(id_, ex.code, str(ex))
+    except Exception as ex:
+        logger.exception("scheduler rpc %s failed", req.get("method"))
+        resp = _error(id_, INTERNAL_ERROR, str(ex))
+    else:
+        resp = {"jsonrpc": "2.0", "id": id_, "result": result}
+    return resp if "id" in req else None
+
+
+async def handle_message(line: bytes, methods: Dict[str, Method]) -> Optional[Any]:
+    try:
+        msg = json.loads(line)
+    except Exception:
+        return _error(None, PARSE_ERROR, "Parse error")
+    if isinstance(msg, list):
+        if not msg:
+            return _error(None, INVALID_REQUEST, "Empty batch")
+        out = [r for r in await asyncio.gather(*(handle_request(m, methods) for m in msg)) if r is not None]
+        return out or None
+    return await handle_request(msg, methods)
+
+
+async def serve(host: str, port: int, methods: Optional[Dict[str, Method]] = None) -> asyncio.AbstractServer:
+    methods = methods or METHODS
+
+    async def _conn(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def _answer(line: bytes) -> None:
+            resp = await handle_message(line, methods)
+            if resp is not None:
+                async with write_lock:
+                    writer.write(json.dumps(resp).encode("utf-8") + b"\n")
+                    await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    t = asyncio.create_task(_answer(line))
+                    tasks.add(t)
+                    t.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(_conn, host, port, limit=2 ** 20)
+
+
+# ---------- client ----------
+class SchedulerClient:
+    """Persistent, pipelined JSON-RPC connection (re-opened per event loop / after failures)."""
+
+    def __init__(self, url: str, timeout: float = SCHEDULER_RPC_TIMEOUT):
+        u = urlparse(url)
+        self.host, self.port = u.hostname or "localhost", u.port or 9100
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    async def _ensure(self) -> asyncio.StreamWriter:
+        """Open writer for this event loop; raises ServiceUnavailable when it cannot be opened."""
+        loop = asyncio.get_running_loop()
+        writer = self._writer
+        if writer is not None and self._loop is loop and not writer.is_closing():
+            return writer
+        if self._loop is not loop:
+            self._connect_lock = asyncio.Lock()
+            self._writer = None
+        async with self._connect_lock:
+            writer = self._writer
+            if writer is not None and not writer.is_closing():
+                return writer
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, limit=2 ** 20), self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise ServiceUnavailable(f"connect to {self.host}:{self.port} timed out") from None
+            except OSError as ex:
+                raise ServiceUnavailable(f"connect to {self.host}:{self.port} failed: {ex!r}") from ex
+            self._reader, self._writer, self._loop = reader, writer, loop
+            asyncio.create_task(self._read_loop(reader, writer))
+            return writer
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                msg = json.loads(line)
+                for resp in msg if isinstance(msg, list) else [msg]:
+                    fut = self._pending.pop(resp.get("id"), None)
+                    if fut is not None and not fut.done():
+                        fut.set_result(resp)
+        except Exception:
+            logger.exception("scheduler rpc connection failed")
+        finally:
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(RpcConnectionLost("scheduler rpc connection closed"))
+            self._pending.clear()
+
+    async def call_batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Send calls as one batch message; returns results in order (raises RpcError on the first error)."""
+        writer = await self._ensure()
+        if writer.is_closing():
+            raise ServiceUnavailable("scheduler rpc connection closed before sending")
+        loop = asyncio.get_running_loop()
+        reqs, futs = [], []
+        for method, params in calls:
+            id_ = next(self._ids)
+            fut = loop.create_future()
+            self._pending[id_] = fut
+            reqs.append({"jsonrpc": "2.0", "id": id_, "method": method, "params": params})
+            futs.append(fut)
+        payload = reqs if len(reqs) > 1 else reqs[0]
+        try:
+            writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+            await writer.drain()
+            responses = await asyncio.wait_for(asyncio.gather(*futs), self.timeout)
+        except asyncio.TimeoutError:
+            raise RpcTimeout(f"no response from scheduler service within {self.timeout}s") from None
+        except OSError as ex:
+            # part of the payload may already be on the wire
+            raise RpcConnectionLost(f"scheduler rpc connection failed while sending: {ex!r}") from ex
+        finally:
+            for req in reqs:
+                self._pending.pop(req["id"], None)
+        out = []
+        for resp in responses:
+            if "error" in resp:
+                raise RpcError(resp["error"].get("code", INTERNAL_ERROR), resp["error"].get("message", ""))
+            out.append(resp.get("result"))
+        return out
+
+    async def call(self, method: str, params: Dict[str, Any]) -> Any:
+        return (await self.call_batch([(method, params)]))[0]
+
+
+_client: Optional[SchedulerClient] = None
+
+
+def get_client() -> Optional[SchedulerClient]:
+    global _client
+    if not SCHEDULER_RPC_URL:
+        return None
+    if _client is None:
+        _client = SchedulerClient(SCHEDULER_RPC_URL)
+    return _client
+
+
+async def create_event(employee_id: int) -> Dict[str, Any]:
+    """A2A entry point used by AccountAgent: remote service first, in-process fallback."""
+    client = get_client()
+    if client is not None:
+        try:
+            res = await client.call("create_event", {"employee_id": employee_id})
+            return {**res, "transport": "rpc"}
+        except ServiceUnavailable as ex:
+            # nothing was sent; RpcTimeout / RpcConnectionLost propagate (the service may be running it)
+            logger.warning("scheduler service unavailable (%r); running in-process", ex)
+    res = await _create_event({"employee_id": employee_id})
+    return {**res, "transport": "in-process"}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main() -> None:
+        host, _, port = SCHEDULER_RPC_BIND.rpartition(":")
+        server = await serve(host or "0.0.0.0", int(port))
+        logger.info("scheduler service listening on %s", SCHEDULER_RPC_BIND)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(_main())
@@ -33,3 +33,20 @@ class LogOut(BaseModel):
 class RunResult(BaseModel):
     employee_id: int
     trace_ids: List[int]
+
+class EmployeeFilter(BaseModel):
+    status: Optional[List[str]] = Field(None, examples=[["PENDING", "FAILED"]])
+    department: Optional[str] = None
+    start_from: Optional[date] = None
+    start_to: Optional[date] = None
+    archived: Optional[bool] = None
+
+class BulkRequest(BaseModel):
+    """Select employees either by explicit ids or by filter (not both)."""
+    ids: Optional[List[int]] = None
+    filter: Optional[EmployeeFilter] = None
+
+class ProfilingSettings(BaseModel):
+    sample_rate: Optional[float] = Field(None, ge=0, le=1, examples=[0.05])
+    interval_ms: Optional[float] = Field(None, ge=1, examples=[5])
+    slow_query_ms: Optional[float] = Field(None, examples=[200])
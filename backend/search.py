@@ -0,0 +1,199 @@
+"""
+Employee search: prefix + fuzzy matching over name, email, role and department.
+
+Both backends rank the same way. Every query token must match a row; per
+token an exact token scores 3, a token prefix 2, otherwise a fuzzy similarity
+(< 1); rows are ordered by the summed score, newest first on ties. Queries
+whose tokens are all shorter than MIN_TRGM_LEN list employees whose name
+starts with the query, in name order.
+
+- Postgres: a trigram GIN expression index (pg_trgm, migration 9) over the
+  lower-cased concatenated fields serves LIKE and the word-similarity operator
+  `<%`; short queries use a btree index on lower(name) (migration 11).
+- Other dialects (SQLite, local testing): an in-memory token prefix index,
+  rebuilt whenever the active employee set changes.
+"""
+import bisect
+import difflib
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from db import Employee
+
+# must match the expression of ix_employees_search_trgm exactly
+SEARCH_DOC_SQL = "lower(name || ' ' || email || ' ' || role || ' ' || coalesce(department, ''))"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+FUZZY_CUTOFF = 0.75
+# pg_trgm cannot prune shorter patterns; queries made only of such tokens are
+# served as a name-prefix listing (btree ix_employees_name_prefix) instead
+MIN_TRGM_LEN = 3
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+
+
+def is_short(tokens: List[str]) -> bool:
+    return all(len(t) < MIN_TRGM_LEN for t in tokens)
+
+
+def _pack(id_, name, email, role, department, start_date, status, score) -> Dict[str, Any]:
+    return {
+        "id": id_,
+        "name": name,
+        "email": email,
+        "role": role,
+        "department": department or "-",
+        "start_date": start_date.isoformat() if hasattr(start_date, "isoformat") else start_date,
+        "status": status or "PENDING",
+        "score": round(float(score), 3),
+    }
+
+
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# ---------- Postgres: pg_trgm ----------
+def _token_pattern(tok: str, whole: bool) -> str:
+    # tokens are [a-z0-9]+, so nothing needs escaping in the regex
+    return "(^|[^a-z0-9])" + tok + ("([^a-z0-9]|$)" if whole else "")
+
+
+def _postgres_query(q: str, limit: int, offset: int) -> Tuple[str, Dict[str, Any]]:
+    """SQL + params; same tokens, tiers and order as PrefixIndex (see module docstring)."""
+    params: Dict[str, Any] = {"limit": limit, "offset": offset}
+    tokens = _TOKEN_RE.findall(q)
+    if is_short(tokens):
+        params["prefix"] = _like_escape(q) + "%"
+        return f"""
+            SELECT id, name, email, role, department, start_date, status, {PREFIX_SCORE} AS score
+            FROM employees
+            WHERE archived_at IS NULL AND lower(name) COLLATE "C" LIKE :prefix
+            ORDER BY lower(name) COLLATE "C", id
+            LIMIT :limit OFFSET :offset
+        """, params
+    scores, matches = [], []
+    for i, tok in enumerate(tokens):
+        params[f"t{i}"] = tok
+        params[f"w{i}"] = _token_pattern(tok, whole=True)
+        params[f"p{i}"] = _token_pattern(tok, whole=False)
+        fuzzy = f"word_similarity(:t{i}, {SEARCH_DOC_SQL})"
+        scores.append(
+            f"CASE WHEN {SEARCH_DOC_SQL} ~ :w{i} THEN {EXACT_SCORE} "
+            f"WHEN {SEARCH_DOC_SQL} ~ :p{i} THEN {PREFIX_SCORE} ELSE {fuzzy} END"
+        )
+        if len(tok) >= MIN_TRGM_LEN:
+            params[f"c{i}"] = f"%{tok}%"
+            matches.append(f"({SEARCH_DOC_SQL} LIKE :c{i} OR :t{i} <% {SEARCH_DOC_SQL})")
+        else:  # too short for the index: filter only, by token prefix
+            matches.append(f"{SEARCH_DOC_SQL} ~ :p{i}")
+    return f"""
+        SELECT id, name, email, role, department, start_date, status, {" + ".join(scores)} AS score
+        FROM employees
+        WHERE archived_at IS NULL AND {" AND ".join(matches)}
+        ORDER BY score DESC, id DESC
+        LIMIT :limit OFFSET :offset
+    """, params
+
+
+def _search_postgres(db: Session, q: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+    sql, params = _postgres_query(q, limit, offset)
+    return [_pack(*r[:7], score=r.score) for r in db.execute(text(sql), params).all()]
+
+
+# ---------- fallback: in-memory prefix index ----------
+class PrefixIndex:
+    """Sorted token vocabulary for bisect prefix lookups and difflib fuzzy matches."""
+
+    def __init__(self, rows: List[Tuple]):
+        self.rows = {r[0]: r for r in rows}
+        self.by_token: Dict[str, Set[int]] = defaultdict(set)
+        for r in rows:
+            for field in r[1:5]:
+                for tok in _TOKEN_RE.findall((field or "").lower()):
+                    self.by_token[tok].add(r[0])
+        self.vocab = sorted(self.by_token)
+        self.names = sorted(((r[1] or "").lower(), r[0]) for r in rows)
+
+    def _prefix(self, tok: str) -> Dict[int, float]:
+        hits: Dict[int, float] = {}
+        i = bisect.bisect_left(self.vocab, tok)
+        while i < len(self.vocab) and self.vocab[i].startswith(tok):
+            score = EXACT_SCORE if self.vocab[i] == tok else PREFIX_SCORE
+            for id_ in self.by_token[self.vocab[i]]:
+                hits[id_] = max(hits.get(id_, 0.0), score)
+            i += 1
+        return hits
+
+    def _fuzzy(self, tok: str) -> Dict[int, float]:
+        hits: Dict[int, float] = {}
+        for cand in difflib.get_close_matches(tok, self.vocab, n=20, cutoff=FUZZY_CUTOFF):
+            ratio = difflib.SequenceMatcher(None, tok, cand).ratio()
+            for id_ in self.by_token[cand]:
+                hits[id_] = max(hits.get(id_, 0.0), ratio)
+        return hits
+
+    def _name_prefix(self, q: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        out = []
+        i = bisect.bisect_left(self.names, (q,))
+        while i < len(self.names) and self.names[i][0].startswith(q) and len(out) < offset + limit:
+            out.append(self.names[i][1])
+            i += 1
+        return [_pack(*self.rows[id_], score=PREFIX_SCORE) for id_ in out[offset:]]
+
+    def search(self, q: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        q = q.lower()
+        tokens = _TOKEN_RE.findall(q)
+        if not tokens:
+            return []
+        if is_short(tokens):
+            return self._name_prefix(q, limit, offset)
+        scores: Optional[Dict[int, float]] = None
+        for tok in tokens:
+            hits = self._prefix(tok) or (self._fuzzy(tok) if len(tok) >= MIN_TRGM_LEN else {})
+            if scores is None:
+                scores = hits
+            else:  # every query token must match
+                scores = {i: scores[i] + s for i, s in hits.items() if i in scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], -kv[0]))[offset:offset + limit]
+        return [_pack(*self.rows[i], score=s) for i, s in ranked]
+
+
+_index: Optional[PrefixIndex] = None
+_index_sig: Optional[Tuple] = None
+_index_lock = threading.Lock()
+
+
+def _active(q):
+    return q.filter(Employee.archived_at.is_(None))
+
+
+def _fallback_index(db: Session) -> PrefixIndex:
+    global _index, _index_sig
+    sig = tuple(_active(db.query(
+        func.count(Employee.id), func.max(Employee.id), func.max(Employee.created_at), func.max(Employee.updated_at)
+    )).one())
+    with _index_lock:
+        if _index is None or sig != _index_sig:
+            rows = _active(db.query(
+                Employee.id, Employee.name, Employee.email, Employee.role, Employee.department,
+                Employee.start_date, Employee.status,
+            )).all()
+            _index, _index_sig = PrefixIndex([tuple(r) for r in rows]), sig
+        return _index
+
+
+def search_employees(db: Session, q: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    q = (q or "").strip().lower()
+    if not _TOKEN_RE.search(q):
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, q, limit, offset)
+    return _fallback_index(db).search(q, limit, offset)
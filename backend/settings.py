@@ -6,7 +6,19 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "krnl_onboarding")
 POSTGRES_USER = os.getenv("POSTGRES_USER", "krnl_user")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "krnl_pass")
 
-DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+# DATABASE_URL overrides the Postgres settings, e.g. sqlite:///krnl.db (file, WAL) or sqlite:// (in-memory)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+# === Connection pools (per process) ===
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# === Optional read replica for dashboard reads ===
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+# after a write, reads stay on the primary for this long (read-your-writes)
+DB_READ_STICKY_SECONDS = float(os.getenv("DB_READ_STICKY_SECONDS", "5"))
 
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8080"))
@@ -26,11 +38,53 @@ SMTP_FROM = os.getenv("SMTP_FROM")
 GOOGLE_CALENDAR_CREDENTIALS_JSON = os.getenv("GOOGLE_CALENDAR_CREDENTIALS_JSON")
 
 SIMULATE_INTEGRATIONS = os.getenv("SIMULATE_INTEGRATIONS", "true").lower() == "true"
+# === Dashboard counters: periodic rebuild from source tables (0 disables) ===
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "900"))
+
+# === /api/run: how long stored Idempotency-Key responses are replayed ===
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# how long a run waits for the same employee's run on another worker before giving up (409)
+RUN_LOCK_WAIT_SECONDS = float(os.getenv("RUN_LOCK_WAIT_SECONDS", "120"))
+
+# === Auto-run: start pipelines for upcoming hires in an off-peak window ===
+AUTORUN_ENABLED = os.getenv("AUTORUN_ENABLED", "false").lower() == "true"
+AUTORUN_INTERVAL_SECONDS = float(os.getenv("AUTORUN_INTERVAL_SECONDS", "300"))
+AUTORUN_HORIZON_DAYS = int(os.getenv("AUTORUN_HORIZON_DAYS", "14"))
+AUTORUN_WINDOW = os.getenv("AUTORUN_WINDOW", "22:00-06:00")  # local time (DEFAULT_TZ); empty = always
+AUTORUN_BATCH_SIZE = int(os.getenv("AUTORUN_BATCH_SIZE", "50"))
+AUTORUN_CONCURRENCY = int(os.getenv("AUTORUN_CONCURRENCY", "4"))
+AUTORUN_JITTER_SECONDS = float(os.getenv("AUTORUN_JITTER_SECONDS", "5"))
+
+# === Scheduler A2A service (scheduler_service.py); empty URL = run SchedulerAgent in-process ===
+SCHEDULER_RPC_URL = os.getenv("SCHEDULER_RPC_URL") or None  # e.g. tcp://scheduler:9100
+SCHEDULER_RPC_BIND = os.getenv("SCHEDULER_RPC_BIND", "0.0.0.0:9100")
+# must exceed LLM_TIMEOUT: a timed-out call is not retried in-process
+SCHEDULER_RPC_TIMEOUT = float(os.getenv("SCHEDULER_RPC_TIMEOUT", "90"))
+
+# === Profiling (runtime-adjustable via /api/admin/profiling) ===
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of runs, 0..1
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # <= 0 disables
+# how often each worker picks up settings stored via the admin endpoint (0 disables)
+PROFILE_SETTINGS_REFRESH_SECONDS = float(os.getenv("PROFILE_SETTINGS_REFRESH_SECONDS", "5"))
+
+# === Admission control for pipeline runs (admission.py); shared across workers on Postgres ===
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))
+ADMISSION_TENANT_MAX_CONCURRENT = int(os.getenv("ADMISSION_TENANT_MAX_CONCURRENT", "2"))
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "32"))  # waiting requests per worker
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30"))
+ADMISSION_LEASE_TTL_SECONDS = int(os.getenv("ADMISSION_LEASE_TTL_SECONDS", "900"))  # reclaims slots of crashed workers
+
 # === LLM settings (needed by agents.llm_utils) ===
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
 LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "30"))
 
+# === Background precomputation of LLM artefacts at employee creation ===
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "true").lower() == "true"
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+PRECOMPUTE_QUEUE_MAX = int(os.getenv("PRECOMPUTE_QUEUE_MAX", "10000"))
+
 # === Defaults for scheduling/email content ===
 DEFAULT_TZ = os.getenv("DEFAULT_TZ", "Asia/Bangkok")
 DEFAULT_LOCATION = os.getenv("DEFAULT_LOCATION", "HQ - Room A")
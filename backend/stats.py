@@ -0,0 +1,160 @@
+"""
+Incrementally maintained dashboard counters.
+
+Every employee insert, status transition, delete and archive (bulk.py)
+bumps rows of `employee_counters` (status, department, start week) inside
+the same transaction as the change, so /api/stats never scans `employees`.
+`reconcile()` rebuilds the table from the source rows and runs periodically
+to repair any drift (e.g. rows changed by hand in SQL); only the worker holding
+the reconcile advisory lock runs it, since it locks the counters table.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from db import SessionLocal, Employee, EmployeeCounter, Leader, insert_for
+
+logger = logging.getLogger("krnl.stats")
+
+NO_DEPARTMENT = "-"
+RECONCILE_LOCK_KEY = 72_610_029
+Key = Tuple[str, str, date]
+
+
+def week_of(d: date) -> date:
+    """Monday of the week containing d."""
+    return d - timedelta(days=d.weekday())
+
+
+def key_for(status: Optional[str], department: Optional[str], start_date: date) -> Key:
+    return (status or "PENDING", department or NO_DEPARTMENT, week_of(start_date))
+
+
+def apply_deltas(db: Session, deltas: Dict[Key, int]) -> None:
+    """Atomically add deltas to counters (upsert). Caller commits."""
+    rows = [
+        {"status": k[0], "department": k[1], "start_week": k[2], "n": d}
+        for k, d in deltas.items() if d
+    ]
+    if not rows:
+        return
+    insert = insert_for(db)
+    stmt = insert(EmployeeCounter).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["status", "department", "start_week"],
+        set_={"n": EmployeeCounter.n + stmt.excluded.n},
+    )
+    db.execute(stmt)
+
+
+def on_insert(db: Session, emp: Employee) -> None:
+    apply_deltas(db, {key_for(emp.status, emp.department, emp.start_date): 1})
+
+
+def on_status_change(db: Session, emp: Employee, old: Optional[str], new: Optional[str]) -> None:
+    if (old or "PENDING") == (new or "PENDING"):
+        return
+    if emp.archived_at is not None:
+        return  # archived employees were already taken out of the counters
+    apply_deltas(db, {
+        key_for(old, emp.department, emp.start_date): -1,
+        key_for(new, emp.department, emp.start_date): 1,
+    })
+
+
+def deltas_for(rows: Iterable[Tuple[Optional[str], Optional[str], date, int]], sign: int = 1) -> Dict[Key, int]:
+    """Fold (status, department, start_date, count) rows into counter deltas."""
+    out: Dict[Key, int] = defaultdict(int)
+    for status, department, start_date, n in rows:
+        out[key_for(status, department, start_date)] += sign * n
+    return out
+
+
+def reconcile(db: Session) -> int:
+    """Rebuild counters from active (non-archived) employees; returns the number of buckets written."""
+    if db.get_bind().dialect.name == "postgresql":
+        # concurrent bumps wait for the rebuild instead of being lost or double-counted
+        db.execute(text("LOCK TABLE employee_counters IN EXCLUSIVE MODE"))
+    rows = (
+        db.query(Employee.status, Employee.department, Employee.start_date, func.count())
+        .filter(Employee.archived_at.is_(None))
+        .group_by(Employee.status, Employee.department, Employee.start_date)
+        .all()
+    )
+    fresh = {k: n for k, n in deltas_for(rows).items() if n}
+    db.query(EmployeeCounter).delete(synchronize_session=False)
+    apply_deltas(db, fresh)
+    db.commit()
+    return len(fresh)
+
+
+def summary(db: Session, weeks_ahead: int = 8, today: Optional[date] = None) -> Dict[str, Any]:
+    """Headline numbers: by status, by department and by upcoming start week, each split by status."""
+    first = week_of(today or date.today())
+    last = first + timedelta(weeks=weeks_ahead)
+    by_status: Dict[str, int] = defaultdict(int)
+    by_dept: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    by_week: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    grouped = (
+        db.query(EmployeeCounter.status, EmployeeCounter.department, func.sum(EmployeeCounter.n))
+        .group_by(EmployeeCounter.status, EmployeeCounter.department)
+        .all()
+    )
+    for status, dept, n in grouped:
+        if not n:
+            continue
+        by_status[status] += n
+        by_dept[dept][status] += n
+
+    upcoming = (
+        db.query(EmployeeCounter.start_week, EmployeeCounter.status, func.sum(EmployeeCounter.n))
+        .filter(EmployeeCounter.start_week >= first, EmployeeCounter.start_week < last)
+        .group_by(EmployeeCounter.start_week, EmployeeCounter.status)
+        .all()
+    )
+    for week, status, n in upcoming:
+        if not n:
+            continue
+        by_week[week.isoformat()][status] += n
+
+    def _pack(counts: Dict[str, int]) -> Dict[str, Any]:
+        return {"total": sum(counts.values()), "by_status": dict(counts)}
+
+    return {
+        **_pack(by_status),
+        "by_department": {d: _pack(c) for d, c in sorted(by_dept.items())},
+        "upcoming_weeks": [{"week": w, **_pack(c)} for w, c in sorted(by_week.items())],
+    }
+
+
+async def reconcile_loop(interval: float) -> None:
+    """Lifespan task: periodically repair counter drift (leader worker only)."""
+    def _once():
+        db = SessionLocal()
+        try:
+            return reconcile(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    leader = Leader(RECONCILE_LOCK_KEY, "stats reconcile")
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await asyncio.to_thread(leader.ensure):
+                    continue
+                n = await asyncio.to_thread(_once)
+                logger.info("stats reconciled (%d buckets)", n)
+            except Exception:
+                logger.exception("stats reconcile failed")
+    finally:
+        leader.release()
@@ -0,0 +1,33 @@
+import os
+
+# set before any app module imports settings: tests never need a Postgres server
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import pytest
+import sqlalchemy
+
+import db
+import migrate
+
+
+@pytest.fixture(autouse=True)
+def fresh_db():
+    """Fresh in-memory SQLite schema (latest migration) for every test."""
+    engine = db.use_database("sqlite://")
+    migrate.upgrade(engine)
+    yield engine
+    db.dispose_engine()
+
+
+@pytest.fixture
+def pg_engine():
+    """Fresh schema on the throwaway Postgres at TEST_POSTGRES_URL (dropped first!); skipped when unset."""
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    engine = db.use_database(url)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("DROP SCHEMA public CASCADE; CREATE SCHEMA public"))
+    migrate.upgrade(engine)
+    yield engine
+    db.dispose_engine()
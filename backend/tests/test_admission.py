@@ -0,0 +1,91 @@
+import asyncio
+import admission
+import autorun
+import runner
+from admission import Limiter, Rejected
+
+def test_limits_queue_and_rejection(monkeypatch):
+    monkeypatch.setattr(admission, "_shared", lambda: False)  # per-process limits only
+
+    async def scenario():
+        lim = Limiter(max_concurrent=2, tenant_max_concurrent=1, queue_max=1, max_wait=0.5)
+        a = await lim.acquire("a")
+        b = await lim.acquire("b")          # other tenant fits under the global limit
+        waiter = asyncio.create_task(lim.acquire("a"))
+        await asyncio.sleep(0.01)
+        assert lim.snapshot()["queue_depth"] == 1
+        try:
+            await lim.acquire("c")          # queue full
+            assert False, "expected Rejected"
+        except Rejected as ex:
+            assert ex.retry_after >= 1
+        await lim.release(a)
+        c = await waiter                    # admitted once tenant "a" frees its slot
+        assert lim.snapshot()["active_by_tenant"] == {"a": 1, "b": 1}
+        try:
+            await lim.acquire("b")          # waits, then times out
+            assert False, "expected Rejected"
+        except Rejected:
+            pass
+        await lim.release(b)
+        await lim.release(c)
+        snap = lim.snapshot()
+        assert (snap["active"], snap["admitted"], snap["rejected_queue_full"], snap["rejected_timeout"]) == (0, 3, 1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_tenant_capped_waiter_does_not_block_other_tenants(monkeypatch):
+    monkeypatch.setattr(admission, "_shared", lambda: False)
+
+    async def scenario():
+        lim = Limiter(max_concurrent=4, tenant_max_concurrent=2, queue_max=4, max_wait=1)
+        a1, a2 = await lim.acquire("a"), await lim.acquire("a")
+        waiter = asyncio.create_task(lim.acquire("a"))  # held back by tenant "a" only
+        await asyncio.sleep(0.01)
+        b = await asyncio.wait_for(lim.acquire("b"), 0.1)  # global slots free: no queueing
+        assert lim.snapshot()["queue_depth"] == 1
+        await lim.release(a1)
+        a3 = await waiter
+        for t in (a2, a3, b):
+            await lim.release(t)
+
+    asyncio.run(scenario())
+
+
+def test_postgres_leases_are_deployment_wide(pg_engine):
+    async def scenario():
+        one, other = Limiter(2, 1, queue_max=2, max_wait=0.6), Limiter(2, 1, queue_max=2, max_wait=0.6)
+        a = await one.acquire("a")
+        b = await one.acquire("b")
+        assert a.lease_id and admission.shared_usage() == {"a": 1, "b": 1}
+        try:
+            await other.acquire("c")  # another worker sees the global limit
+            assert False, "expected Rejected"
+        except Rejected:
+            pass
+        waiter = asyncio.create_task(other.acquire("c"))
+        await asyncio.sleep(0.05)
+        await one.release(a)
+        c = await waiter  # picked up by polling the leases
+        assert admission.shared_usage() == {"b": 1, "c": 1}
+        await one.release(b)
+        await other.release(c)
+        assert admission.shared_usage() == {}
+
+    asyncio.run(scenario())
+
+
+def test_autorun_takes_admission_slots(monkeypatch):
+    monkeypatch.setattr(admission, "_shared", lambda: False)
+    lim = Limiter(max_concurrent=4, tenant_max_concurrent=2, queue_max=8, max_wait=1)
+    monkeypatch.setattr(admission, "limiter", lim)
+    peak = []
+
+    async def fake_run(eid):
+        peak.append(lim.active_by_tenant["autorun"])
+        await asyncio.sleep(0.02)
+
+    monkeypatch.setattr(runner, "run_employee", fake_run)
+    assert asyncio.run(autorun.run_batch([1, 2, 3, 4], concurrency=4, jitter=0)) == 4
+    assert max(peak) == 2 and lim.snapshot()["admitted"] == 4
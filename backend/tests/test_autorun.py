@@ -0,0 +1,9 @@
+from datetime import time
+from autorun import parse_window, in_window
+
+def test_window_wraps_past_midnight():
+    w = parse_window("22:00-06:00")
+    assert in_window(time(23, 30), w)
+    assert in_window(time(5, 59), w)
+    assert not in_window(time(12, 0), w)
+    assert in_window(time(12, 0), parse_window(""))
@@ -0,0 +1,44 @@
+import datetime
+from db import SessionLocal, Employee, AgentLog
+import bulk, runner, stats
+
+def _add(db, name, status="PENDING"):
+    e = Employee(name=name, email=f"{name}@krnl.io", role="HR", department="R&D",
+                 start_date=datetime.date(2025, 9, 1), status=status)
+    db.add(e); stats.on_insert(db, e); db.commit()
+    return e
+
+def test_archive_and_delete_keep_counters_consistent():
+    db = SessionLocal()
+    try:
+        a, b = _add(db, "ada"), _add(db, "bob")
+        db.add(AgentLog(employee_id=a.id, agent="Validator")); db.commit()
+        assert bulk.archive_employees(db, [a.id]) == {"employees": 1}
+        assert stats.summary(db)["by_status"] == {"PENDING": 1}
+
+        # running an archived employee must not touch the counters
+        a = db.get(Employee, a.id)
+        runner._set_status(db, a, "COMPLETED")
+        runner._set_status(db, db.get(Employee, b.id), "RUNNING")
+        assert stats.summary(db)["by_status"] == {"RUNNING": 1}
+
+        counts = bulk.delete_employees(db, [a.id, b.id])
+        assert counts["employees"] == 2 and counts["agent_logs"] == 1
+        assert stats.summary(db) == {"total": 0, "by_status": {}, "by_department": {}, "upcoming_weeks": []}
+    finally:
+        db.close()
+
+def test_archived_employee_does_not_block_reimport():
+    from fastapi.testclient import TestClient
+    import main
+    db = SessionLocal()
+    try:
+        a = _add(db, "ada")
+        bulk.archive_employees(db, [a.id])
+    finally:
+        db.close()
+    csv_body = "name,email,role,department,start_date\nAda,ada@krnl.io,HR,R&D,2025-09-01\n"
+    c = TestClient(main.app)
+    files = {"file": ("hires.csv", csv_body, "text/csv")}
+    assert c.post("/api/employees/upload_csv", files=files).json()["summary"]["inserted"] == 1
+    assert c.post("/api/employees/upload_csv", files=files).json()["summary"]["skipped"] == 1  # active duplicate
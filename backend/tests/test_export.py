@@ -0,0 +1,42 @@
+import csv, datetime, gzip, io, json
+from fastapi.testclient import TestClient
+from db import SessionLocal, Employee, Account, CalendarEvent, AgentLog
+import export, main
+
+PASSWORD = "Tmp-s3cret-pw"
+
+def _seed():
+    db = SessionLocal()
+    try:
+        for i in range(1, 6):
+            db.add(Employee(id=i, name=f"E{i}", email=f"e{i}@krnl.io", role="HR",
+                            department="R&D" if i % 2 else "Ops", start_date=datetime.date(2025, 9, i)))
+        db.flush()
+        for i in range(1, 6):
+            db.add(Account(employee_id=i, username=f"e{i}", temp_password=PASSWORD, permissions=["employee:read"]))
+        db.add(CalendarEvent(employee_id=1, event_json={"start": {"dateTime": "2025-09-01T09:00"}, "location": "HQ"}))
+        db.add(CalendarEvent(employee_id=1, event_json={"start": {"dateTime": "2025-09-02T09:00"}}))
+        db.add(AgentLog(employee_id=3, agent="ValidatorAgent", status="FAILED"))
+        db.add(AgentLog(employee_id=3, agent="NotifierAgent", status="OK"))
+        db.commit()
+    finally:
+        db.close()
+
+def test_export_streams_pages_without_passwords(monkeypatch):
+    _seed()
+    monkeypatch.setattr(export, "PAGE_SIZE", 2)  # 5 employees -> 3 pages
+    c = TestClient(main.app)
+
+    res = c.get("/api/export?format=csv&gzip=true")
+    assert res.headers["content-type"] == "application/gzip"
+    raw = gzip.decompress(res.content).decode("utf-8")
+    assert PASSWORD not in raw and "temp_password" not in raw
+    rows = list(csv.DictReader(io.StringIO(raw)))
+    assert [r["employee_id"] for r in rows] == ["1", "1", "2", "3", "4", "5"]  # one row per calendar event
+    assert rows[0]["event_location"] == "HQ" and json.loads(rows[0]["permissions"]) == ["employee:read"]
+    assert (rows[3]["last_agent"], rows[3]["last_agent_status"]) == ("NotifierAgent", "OK")  # latest log only
+
+    res = c.get("/api/export?format=ndjson&start_from=2025-09-02&start_to=2025-09-05&department=R%26D")
+    recs = [json.loads(line) for line in res.text.splitlines()]
+    assert [r["employee_id"] for r in recs] == [3, 5]
+    assert all("temp_password" not in r for r in recs)
@@ -0,0 +1,50 @@
+import datetime
+from sqlalchemy import inspect, text
+import db, migrate, search, stats
+from db import SessionLocal, EmployeeCounter
+
+# schema as created by the baseline's create_all(), before migrations existed
+BASELINE_DDL = [
+    "CREATE TABLE employees (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, email VARCHAR NOT NULL,"
+    " role VARCHAR NOT NULL, department VARCHAR, start_date DATE NOT NULL, status VARCHAR, raw_payload JSON,"
+    " created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)",
+    "CREATE INDEX ix_employees_email ON employees (email)",
+    "CREATE TABLE accounts (id INTEGER PRIMARY KEY, employee_id INTEGER NOT NULL REFERENCES employees (id),"
+    " username VARCHAR NOT NULL UNIQUE, temp_password VARCHAR NOT NULL, permissions JSON, created_at DATETIME)",
+    "CREATE TABLE calendar_events (id INTEGER PRIMARY KEY, employee_id INTEGER NOT NULL REFERENCES employees (id),"
+    " event_json JSON NOT NULL, created_at DATETIME)",
+    "CREATE TABLE notifications (id INTEGER PRIMARY KEY, employee_id INTEGER NOT NULL REFERENCES employees (id),"
+    " channel VARCHAR NOT NULL, message TEXT NOT NULL, sent_json JSON, created_at DATETIME)",
+    "CREATE TABLE agent_logs (id INTEGER PRIMARY KEY, employee_id INTEGER NOT NULL REFERENCES employees (id),"
+    " agent VARCHAR NOT NULL, input JSON, steps JSON, output JSON, status VARCHAR, created_at DATETIME)",
+]
+
+def test_upgrade_adopts_baseline_schema():
+    engine = db.use_database("sqlite://")
+    with engine.begin() as conn:
+        for ddl in BASELINE_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text(
+            "INSERT INTO employees (name, email, role, department, start_date, status) VALUES "
+            "('Ada', 'ada@krnl.io', 'HR', 'R&D', '2025-09-03', 'PENDING'),"
+            "('Bob', 'bob@krnl.io', 'HR', 'R&D', '2025-09-05', 'PENDING'),"
+            "('Cy', 'cy@krnl.io', 'HR', NULL, '2025-09-10', NULL)"
+        ))
+    assert migrate.upgrade(engine) == migrate.LATEST_VERSION
+    assert "archived_at" in {c["name"] for c in inspect(engine).get_columns("employees")}
+
+    s = SessionLocal()
+    try:
+        backfilled = {(c.status, c.department, c.start_week): c.n for c in s.query(EmployeeCounter)}
+        assert backfilled == {
+            ("PENDING", "R&D", datetime.date(2025, 9, 1)): 2,
+            ("PENDING", "-", datetime.date(2025, 9, 8)): 1,
+        }
+        stats.reconcile(s)
+        assert {(c.status, c.department, c.start_week): c.n for c in s.query(EmployeeCounter)} == backfilled
+    finally:
+        s.close()
+    assert migrate.upgrade(engine) == migrate.LATEST_VERSION  # idempotent
+
+def test_search_doc_matches_trgm_index_expression():
+    assert search.SEARCH_DOC_SQL == migrate.SEARCH_DOC_SQL_V9
@@ -0,0 +1,19 @@
+from fastapi.testclient import TestClient
+import main, profiling
+
+def test_admin_settings_reach_every_worker(monkeypatch):
+    monkeypatch.setattr(profiling, "config", profiling.ProfilingConfig())
+    c = TestClient(main.app)
+    res = c.put("/api/admin/profiling", json={"sample_rate": 0.25})
+    assert res.status_code == 200 and res.json()["sample_rate"] == 0.25
+
+    # another worker: still on env defaults until its next refresh
+    monkeypatch.setattr(profiling, "config", profiling.ProfilingConfig())
+    assert profiling.config.sample_rate == profiling._DEFAULTS.sample_rate
+    profiling.load_settings()
+    assert profiling.config.sample_rate == 0.25
+    assert profiling.config.slow_query_ms == profiling._DEFAULTS.slow_query_ms  # not overridden
+
+    c.put("/api/admin/profiling", json={"slow_query_ms": 50})
+    assert c.get("/api/admin/profiling").json() | {"interval_ms": None} == {
+        "sample_rate": 0.25, "slow_query_ms": 50, "interval_ms": None}
@@ -0,0 +1,49 @@
+from replay import diff, _clean
+
+def test_diff_ignores_volatile_fields():
+    a = {"username": "ada1f2e", "permissions": ["repo:read"], "steps": [{"log_id": 3, "ok": True}]}
+    b = {"username": "ada9c0d", "permissions": ["repo:read", "ci:run"], "steps": [{"log_id": 8, "ok": True}]}
+    assert diff(_clean(a), _clean(b)) == ["permissions[1]: added 'ci:run'"]
+    assert diff(_clean(a), _clean(a)) == []
+
+
+def test_replay_recorded_run_offline(fresh_db, monkeypatch):
+    import asyncio, datetime, httpx
+    import db, migrate, runner
+    from agents import llm_utils, scheduler_agent
+    from db import SessionLocal, Employee
+    from replay import load_runs, replay
+
+    normalize = {"corrections": [{"field": "role", "from": "hr", "to": "HR"}], "warnings": []}
+    orientation = {"start": {"dateTime": "2025-09-01T09:00:00+07:00"}, "end": {"dateTime": "2025-09-01T10:00:00+07:00"},
+                   "location": "HQ", "description": "Orientation"}
+    network = []
+
+    async def _post(*a, **kw):
+        network.append(a)
+        raise AssertionError("network LLM call during test")
+
+    async def _recorder(prompt):
+        return dict(orientation if "orientation" in prompt else normalize)
+
+    monkeypatch.setattr(httpx.AsyncClient, "post", _post)
+    with monkeypatch.context() as m:  # the original run, with a (fake) LLM configured
+        m.setattr(llm_utils, "_chat_json", _recorder)
+        m.setattr(llm_utils, "have_llm", lambda: True)
+        m.setattr(scheduler_agent, "have_llm", lambda: True)
+        s = SessionLocal()
+        e = Employee(name="Ada Lovelace", email="ada@krnl.io", role="HR", department="People",
+                     start_date=datetime.date(2025, 9, 1), status="PENDING")
+        s.add(e); s.commit(); eid = e.id; s.close()
+        asyncio.run(runner.run_employee(eid))
+
+    runs = load_runs(fresh_db)
+    assert list(runs) == [eid] and set(runs[eid][0]) == {"Validator", "Account", "Scheduler", "Notifier"}
+    assert any(st.get("description") == "AI-proposed event" for st in runs[eid][0]["Scheduler"].steps)
+
+    migrate.upgrade(db.use_database("sqlite://"))  # scratch target
+    report = asyncio.run(replay(runs))
+    [r] = report["runs"]
+    assert r["error"] is None and r["llm_calls"] > 0, r
+    assert report["summary"]["runs_with_diffs"] == 0, r["agents"]
+    assert network == []
@@ -0,0 +1,86 @@
+import asyncio, datetime
+from fastapi.testclient import TestClient
+from db import SessionLocal, Employee
+from orchestrator import orchestrator
+import main, runner
+
+def _employee():
+    db = SessionLocal()
+    e = Employee(name="Ada", email="ada@krnl.io", role="HR", start_date=datetime.date(2025, 9, 1), status="PENDING")
+    db.add(e); db.commit(); db.refresh(e); db.close()
+    return e.id
+
+def _status(eid):
+    db = SessionLocal()
+    try:
+        return db.get(Employee, eid).status
+    finally:
+        db.close()
+
+def _fake_orchestrator(monkeypatch, calls, exc=None):
+    async def run(employee_id):
+        calls.append(employee_id)
+        await asyncio.sleep(0.05)
+        if exc is not None:
+            raise exc
+        return [len(calls)]
+    monkeypatch.setattr(orchestrator, "run", run)
+
+def test_concurrent_runs_share_one_pipeline(monkeypatch):
+    calls = []
+    _fake_orchestrator(monkeypatch, calls)
+    eid = _employee()
+
+    async def scenario():
+        return await asyncio.gather(runner.run_employee(eid), runner.run_employee(eid))
+
+    assert asyncio.run(scenario()) == [[1], [1]]
+    assert calls == [eid] and _status(eid) == "COMPLETED"
+
+def test_run_errors_and_idempotency_replay(monkeypatch):
+    calls = []
+    _fake_orchestrator(monkeypatch, calls)
+    eid = _employee()
+    c = TestClient(main.app)
+    first = c.post(f"/api/run/{eid}", headers={"Idempotency-Key": "k1"})
+    again = c.post(f"/api/run/{eid}", headers={"Idempotency-Key": "k1"})
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json() and again.headers.get("Idempotent-Replayed") == "true"
+    assert len(calls) == 1
+    assert c.post("/api/run/999", headers={"Idempotency-Key": "k1"}).status_code == 422  # key reused
+    assert c.post("/api/run/999").status_code == 404
+
+    # an agent's KeyError is a failed run, not a missing employee
+    _fake_orchestrator(monkeypatch, calls, exc=KeyError("log_id"))
+    eid2 = _employee()
+    assert c.post(f"/api/run/{eid2}").status_code == 500
+    assert _status(eid2) == "FAILED"
+
+def test_cross_worker_lock_wait_is_bounded(pg_engine):
+    from sqlalchemy import text
+    eid = _employee()
+    holder = pg_engine.connect()  # "another worker" running this employee
+    holder.execute(text("SELECT pg_advisory_lock(:c, :k)"), {"c": runner.RUN_LOCK_CLASS, "k": eid})
+    holder.commit()
+
+    async def scenario():
+        lock = runner.EmployeeRunLock(eid, max_wait=0.3)
+        try:
+            await lock.acquire()
+            assert False, "expected RunInProgress"
+        except runner.RunInProgress:
+            pass
+        assert lock.waited and pg_engine.pool.checkedout() == 1  # only the holder's connection
+
+        holder.execute(text("SELECT pg_advisory_unlock(:c, :k)"), {"c": runner.RUN_LOCK_CLASS, "k": eid})
+        holder.commit()
+        lock = runner.EmployeeRunLock(eid, max_wait=0.3)
+        await lock.acquire()
+        assert pg_engine.pool.checkedout() == 2
+        await lock.release()
+        assert pg_engine.pool.checkedout() == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        holder.close()
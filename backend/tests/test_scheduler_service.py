@@ -0,0 +1,99 @@
+import asyncio
+from scheduler_service import serve, SchedulerClient, RpcError, METHOD_NOT_FOUND
+
+async def _echo(params):
+    await asyncio.sleep(0.01)
+    return {"employee_id": params["employee_id"]}
+
+def test_rpc_batch_over_persistent_connection():
+    async def scenario():
+        server = await serve("127.0.0.1", 0, methods={"create_event": _echo})
+        port = server.sockets[0].getsockname()[1]
+        client = SchedulerClient(f"tcp://127.0.0.1:{port}", timeout=5)
+        try:
+            out = await client.call_batch([("create_event", {"employee_id": i}) for i in range(3)])
+            assert [r["employee_id"] for r in out] == [0, 1, 2]
+            assert (await client.call("create_event", {"employee_id": 7}))["employee_id"] == 7
+            try:
+                await client.call("nope", {})
+                assert False, "expected RpcError"
+            except RpcError as ex:
+                assert ex.code == METHOD_NOT_FOUND
+        finally:
+            client._writer.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+def test_timeout_raises_instead_of_running_in_process(monkeypatch):
+    import scheduler_service
+    from scheduler_service import RpcTimeout, create_event
+    fallback_calls = []
+
+    async def _slow(params):
+        await asyncio.sleep(0.5)
+        return {"employee_id": params["employee_id"]}
+
+    async def _fallback(params):
+        fallback_calls.append(params)
+        return {"log_id": 0}
+
+    async def scenario():
+        server = await serve("127.0.0.1", 0, methods={"create_event": _slow})
+        port = server.sockets[0].getsockname()[1]
+        client = SchedulerClient(f"tcp://127.0.0.1:{port}", timeout=0.05)
+        monkeypatch.setattr(scheduler_service, "SCHEDULER_RPC_URL", f"tcp://127.0.0.1:{port}")
+        monkeypatch.setattr(scheduler_service, "_client", client)
+        monkeypatch.setattr(scheduler_service, "_create_event", _fallback)
+        try:
+            try:
+                await create_event(1)
+                assert False, "expected RpcTimeout"
+            except RpcTimeout:
+                pass
+            assert fallback_calls == [] and client._pending == {}
+        finally:
+            client._writer.close()
+            server.close()
+            await server.wait_closed()
+        # service gone: connection refused -> in-process fallback
+        res = await create_event(2)
+        assert res["transport"] == "in-process" and fallback_calls == [{"employee_id": 2}]
+
+    asyncio.run(scenario())
+
+def test_connection_lost_after_send_does_not_run_in_process(monkeypatch):
+    import scheduler_service
+    from scheduler_service import RpcConnectionLost, create_event
+    fallback_calls = []
+    received = asyncio.Event()
+
+    async def _fallback(params):
+        fallback_calls.append(params)
+        return {"log_id": 0}
+
+    async def scenario():
+        async def _drop(reader, writer):
+            await reader.readline()  # request arrived, then the service dies
+            received.set()
+            writer.close()
+
+        server = await asyncio.start_server(_drop, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = SchedulerClient(f"tcp://127.0.0.1:{port}", timeout=5)
+        monkeypatch.setattr(scheduler_service, "SCHEDULER_RPC_URL", f"tcp://127.0.0.1:{port}")
+        monkeypatch.setattr(scheduler_service, "_client", client)
+        monkeypatch.setattr(scheduler_service, "_create_event", _fallback)
+        try:
+            try:
+                await create_event(1)
+                assert False, "expected RpcConnectionLost"
+            except RpcConnectionLost:
+                pass
+            assert received.is_set() and fallback_calls == [] and client._pending == {}
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+from datetime import date
+from db import SessionLocal, Employee
+from search import PrefixIndex, _postgres_query, search_employees
+
+ROWS = [
+    (1, "Ada Lovelace", "ada@krnl.example", "AI Engineer", "R&D", date(2025, 9, 1), "PENDING"),
+    (2, "Alan Turing", "alan@krnl.example", "Backend Engineer", None, date(2025, 9, 8), "COMPLETED"),
+    (3, "Grace Hopper", "grace@krnl.example", "HR", "People", date(2025, 9, 8), "PENDING"),
+]
+# (query, expected ids) shared by both backends: token tiers, AND of tokens, short name-prefix listing
+RANKED = [("al", [2]), ("a", [1, 2]), ("engineer", [2, 1]), ("lovelace", [1]), ("ada engin", [1]),
+          ("eng lo", [1]), ("people", [3]), ("zzz", [])]
+
+def test_prefix_and_fuzzy_search():
+    idx = PrefixIndex(ROWS)
+    for q, ids in RANKED:
+        assert [r["id"] for r in idx.search(q, 10, 0)] == ids, q
+    assert [r["id"] for r in idx.search("hoper", 10, 0)] == [3]  # fuzzy
+    assert [r["id"] for r in idx.search("engineer", 1, 1)] == [1]
+    assert [r["id"] for r in idx.search("a", 1, 1)] == [2]
+
+def test_postgres_short_queries_skip_trigram_path():
+    sql, params = _postgres_query("al", 20, 0)
+    assert "word_similarity" not in sql and 'lower(name) COLLATE "C" LIKE :prefix' in sql
+    sql, params = _postgres_query("lovelace", 20, 0)
+    assert "<%" in sql and params["w0"] == "(^|[^a-z0-9])lovelace([^a-z0-9]|$)"
+
+def test_postgres_ranking_matches_fallback(pg_engine):
+    db = SessionLocal()
+    try:
+        for id_, name, email, role, dept, start, status in ROWS:
+            db.add(Employee(id=id_, name=name, email=email, role=role, department=dept, start_date=start, status=status))
+        db.commit()
+        for q, ids in RANKED:
+            assert [r["id"] for r in search_employees(db, q)] == ids, q
+        assert [r["id"] for r in search_employees(db, "hoper")] == [3]
+    finally:
+        db.close()
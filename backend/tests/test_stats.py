@@ -0,0 +1,33 @@
+import datetime
+from db import SessionLocal, Employee, EmployeeCounter
+import stats
+
+TODAY = datetime.date(2025, 9, 3)  # Wednesday; its week starts 2025-09-01
+
+def _add(db, dept, start, status="PENDING"):
+    e = Employee(name="x", email="x@krnl.io", role="HR", department=dept, start_date=start, status=status)
+    db.add(e); stats.on_insert(db, e); db.commit()
+    return e
+
+def _counters(db):
+    return {(c.status, c.department, c.start_week): c.n for c in db.query(EmployeeCounter) if c.n}
+
+def test_incremental_counters_match_reconcile_and_summary():
+    db = SessionLocal()
+    try:
+        a = _add(db, "R&D", datetime.date(2025, 9, 4))
+        _add(db, "R&D", datetime.date(2025, 9, 10))
+        _add(db, None, datetime.date(2026, 1, 5))
+        stats.on_status_change(db, a, a.status, "COMPLETED"); a.status = "COMPLETED"; db.commit()
+
+        incremental = _counters(db)
+        assert stats.reconcile(db) == 3
+        assert _counters(db) == incremental
+
+        s = stats.summary(db, weeks_ahead=2, today=TODAY)
+        assert s["total"] == 3 and s["by_status"] == {"PENDING": 2, "COMPLETED": 1}
+        assert s["by_department"]["-"] == {"total": 1, "by_status": {"PENDING": 1}}
+        assert [w["week"] for w in s["upcoming_weeks"]] == ["2025-09-01", "2025-09-08"]
+        assert s["upcoming_weeks"][0]["by_status"] == {"COMPLETED": 1}
+    finally:
+        db.close()
@@ -0,0 +1,50 @@
+from validation import validate_rows
+
+def test_validate_rows_reports_errors_and_duplicates():
+    rows = [
+        {"name": "Ada", "email": "ada@x.io", "role": "AI Engineer", "start_date": "2025-01-02"},
+        {"name": "B", "email": "bad", "role": "", "start_date": "nope"},
+        {"name": "Ada L", "email": "ada@x.io", "role": "Chef", "start_date": "02/01/2025"},
+        {"name": "Ada", "email": "ADA@x.io", "role": "HR", "start_date": "2025-01-02"},  # import inserts it too
+    ]
+    out = list(validate_rows(rows))
+    assert out[0]["ok"] and out[0]["row"] == 1
+    assert "Missing required field: role" in out[1]["errors"]
+    assert "Invalid email format" in out[1]["errors"]
+    assert out[2]["errors"] == ["Duplicate of row 1 (same email and start_date)"]
+    assert out[2]["warnings"]
+    assert out[3]["ok"] and out[3]["row"] == 4
+
+def test_preflight_duplicates_match_import():
+    import json
+    from fastapi.testclient import TestClient
+    import main
+    body = ("name,email,role,department,start_date\n"
+            "Ada,ada@x.io,HR,,2025-01-02\n"
+            "Ada,ADA@x.io,HR,,2025-01-02\n"
+            "Ada,ada@x.io,HR,,02/01/2025\n"
+            "Bob,bob@x.io,HR,,bad-date\n")
+    c = TestClient(main.app)
+    diags = [json.loads(l) for l in c.post("/api/validate", content=body, headers={"content-type": "text/csv"}).text.splitlines()]
+    assert [d["row"] for d in diags[:-1]] == [1, 2, 3, 4]
+    assert [d["ok"] for d in diags[:-1]] == [True, True, False, False]
+    res = c.post("/api/employees/upload_csv", files={"file": ("x.csv", body, "text/csv")}).json()
+    assert res["summary"] == {"inserted": 2, "skipped": 1, "errors": 1}
+    assert res["errors"][0]["row"] == 4
+
+def test_upload_statement_count_does_not_grow_with_rows():
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    import db, main
+    selects = []
+    def _count(conn, cursor, statement, *a):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+    event.listen(db.get_engine(), "before_cursor_execute", _count)
+    c = TestClient(main.app)
+    for n in (5, 50):
+        selects.clear()
+        body = "name,email,role,department,start_date\n" + "".join(f"P{n}-{i},p{n}-{i}@x.io,HR,,2025-01-02\n" for i in range(n))
+        assert c.post("/api/employees/upload_csv", files={"file": ("x.csv", body, "text/csv")}).json()["summary"]["inserted"] == n
+        # one duplicate lookup per row, nothing more (no refresh SELECTs after commit)
+        assert len(selects) == n, n
@@ -1,10 +1,7 @@
 import asyncio, datetime
-from db import init_db, SessionLocal, Employee
+from db import SessionLocal, Employee
 from agents.validator_agent import ValidatorAgent
 
-def setup_module(module):
-    init_db()
-
 def test_validator_detects_errors():
     db = SessionLocal()
     e = Employee(name="A", email="bad", role="", start_date=datetime.date.today())
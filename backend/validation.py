@@ -0,0 +1,96 @@
+"""
+Rule set shared by the preflight validator (/api/validate) and ValidatorAgent.
+Everything here is pure: no DB access, no LLM calls.
+"""
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROLE_PERMISSIONS = {
+    "AI Engineer": ["repo:read", "inference:run", "data:read"],
+    "Backend Engineer": ["repo:read", "deploy:trigger"],
+    "HR": ["employee:read", "employee:write"],
+}
+
+EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y")
+REQUIRED_FIELDS = ("name", "email", "role", "start_date")
+KNOWN_ROLES = frozenset(ROLE_PERMISSIONS)
+
+
+def parse_date(s: str) -> date:
+    """Support YYYY-MM-DD, DD/MM/YYYY, MM/DD/YYYY."""
+    s = (s or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except Exception:
+            pass
+    # try ISO loose
+    try:
+        return date.fromisoformat(s)
+    except Exception:
+        raise ValueError("Invalid date format (use YYYY-MM-DD, DD/MM/YYYY, or MM/DD/YYYY)")
+
+
+def check_fields(name: Optional[str], email: Optional[str], role: Optional[str]) -> List[str]:
+    """Rule-based checks applied by ValidatorAgent during a pipeline run."""
+    errors = []
+    if not EMAIL_RE.match(email or ""):
+        errors.append("Invalid email format")
+    if not name or len(name.strip()) < 2:
+        errors.append("Name too short")
+    if not role:
+        errors.append("Role is required")
+    return errors
+
+
+def _clean(row: Dict[str, Any], field: str) -> str:
+    v = row.get(field)
+    return "" if v is None else str(v).strip()
+
+
+def validate_rows(rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Run the full rule set over rows in a single pass and yield one diagnostic per row:
+    {"row": n, "ok": bool, "errors": [...], "warnings": [...]}
+    Rows are numbered from 1 in input order, for CSV and JSON alike.
+    Duplicates are detected within the input on (email, start_date), compared exactly
+    (case-sensitive), the same key upload_csv uses to skip rows.
+    """
+    seen: Dict[Tuple[str, date], int] = {}
+    for n, row in enumerate(rows, start=1):
+        errors: List[str] = []
+        warnings: List[str] = []
+        if not isinstance(row, dict):
+            yield {"row": n, "ok": False, "errors": ["Row is not an object"], "warnings": []}
+            continue
+
+        name, email, role = _clean(row, "name"), _clean(row, "email"), _clean(row, "role")
+        for field in REQUIRED_FIELDS:
+            if not _clean(row, field):
+                errors.append(f"Missing required field: {field}")
+
+        sd = None
+        if _clean(row, "start_date"):
+            try:
+                sd = parse_date(_clean(row, "start_date"))
+            except ValueError as ex:
+                errors.append(str(ex))
+
+        # missing fields are already reported above; only check the format of present ones
+        if email and not EMAIL_RE.match(email):
+            errors.append("Invalid email format")
+        if name and len(name) < 2:
+            errors.append("Name too short")
+        if role and role not in KNOWN_ROLES:
+            warnings.append(f"Unknown role '{role}'; default permissions will apply")
+
+        if email and sd is not None:
+            key = (email, sd)
+            if key in seen:
+                errors.append(f"Duplicate of row {seen[key]} (same email and start_date)")
+            else:
+                seen[key] = n
+
+        yield {"row": n, "ok": not errors, "errors": errors, "warnings": warnings}